@@ -1,42 +1,346 @@
 import requests
+import httpx
 import json
-from settings import FASTAPI_BASE_URL
+import time
+import random
+import asyncio
+import threading
+from uuid import uuid4
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from settings import FASTAPI_BASE_URL, API_CONNECT_TIMEOUT, API_READ_TIMEOUT, API_MAX_RETRIES, API_POOL_SIZE
+from metrics import LatencyStats
+from tracing import tracer
+
+# Gateway errors are worth retrying; everything else is returned to the caller
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+def backoff_delay(attempt: int):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(0.25 * 2 ** attempt, 5.0))
+
+
+class ETagCache:
+    """Last seen body and ETag per complaint, so unchanged complaints come back as a bodiless 304.
+
+    Thread-safe: the Streamlit app shares one client across sessions.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def headers(self, complaint_id: str):
+        with self.lock:
+            entry = self.entries.get(complaint_id)
+        return {"If-None-Match": entry[0]} if entry else {}
+
+    def result(self, complaint_id: str, response):
+        """Turn a complaint response into the returned dict, remembering or reusing the cached body"""
+        with self.lock:
+            if response.status_code == 304 and complaint_id in self.entries:
+                self.entries.move_to_end(complaint_id)
+                return dict(self.entries[complaint_id][1])
+        if response.status_code == 200:
+            complaint = response.json()
+            etag = response.headers.get("ETag")
+            if etag:
+                with self.lock:
+                    self.entries[complaint_id] = (etag, complaint)
+                    self.entries.move_to_end(complaint_id)
+                    while len(self.entries) > self.max_size:
+                        self.entries.popitem(last=False)
+            return complaint
+        with self.lock:
+            self.entries.pop(complaint_id, None)
+        if response.status_code == 404:
+            return {"error": "Complaint not found"}
+        return {"error": f"Failed to retrieve complaint: {response.text}"}
+
 
 class APIClient:
-    def __init__(self):
-        self.base_url = FASTAPI_BASE_URL
-    
+    """Blocking client on a pooled keep-alive session"""
+
+    def __init__(self, base_url=FASTAPI_BASE_URL, connect_timeout=API_CONNECT_TIMEOUT, read_timeout=API_READ_TIMEOUT, max_retries=API_MAX_RETRIES):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latency = LatencyStats()
+        self.etags = ETagCache()
+
+    def request(self, method: str, endpoint: str, path: str, retry=False, **kwargs):
+        """Send a request, recording latency under endpoint; idempotent calls pass retry=True"""
+        attempts = self.max_retries + 1 if retry else 1
+        with tracer.span(f"client {endpoint}") as span:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **tracer.headers()}
+            for attempt in range(attempts):
+                span.set(attempts=attempt + 1)
+                start = time.perf_counter()
+                try:
+                    response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    self.latency.observe(endpoint, time.perf_counter() - start)
+                    if attempt == attempts - 1:
+                        raise
+                else:
+                    self.latency.observe(endpoint, time.perf_counter() - start)
+                    if response.status_code not in RETRYABLE_STATUS or attempt == attempts - 1:
+                        span.set(status_code=response.status_code)
+                        return response
+                    # Release the connection; a stream=True response would otherwise hold it
+                    response.close()
+                time.sleep(backoff_delay(attempt))
+
+    def latency_stats(self):
+        """p50/p95/p99 latency per endpoint"""
+        return self.latency.snapshot()
+
     def create_complaint(self, complaint_data: dict):
         """Create a new complaint via API"""
         try:
-            response = requests.post(
-                f"{self.base_url}/complaints",
-                json=complaint_data,
-                headers={"Content-Type": "application/json"}
+            # One key for every attempt, so a retry after a timeout cannot create a second complaint
+            response = self.request(
+                "POST", "POST /complaints", "/complaints", json=complaint_data,
+                headers={"Idempotency-Key": str(uuid4())}, retry=True
             )
-            
+
             if response.status_code == 200:
                 return response.json()
             else:
                 return {"error": f"Failed to create complaint: {response.text}"}
-        
+
         except requests.exceptions.RequestException as e:
             return {"error": f"Connection error: {str(e)}"}
-    
+
     def get_complaint(self, complaint_id: str):
         """Retrieve complaint details by ID"""
         try:
-            response = requests.get(f"{self.base_url}/complaints/{complaint_id}")
-            
+            response = self.request(
+                "GET", "GET /complaints/{complaint_id}", f"/complaints/{complaint_id}",
+                headers=self.etags.headers(complaint_id), retry=True
+            )
+            return self.etags.result(complaint_id, response)
+
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    def get_complaints(self, complaint_ids: list):
+        """Retrieve many complaints in one round trip; returns {"complaints": [...], "missing": [...]}"""
+        try:
+            # A read-only lookup, so safe to retry even though it is a POST
+            response = self.request(
+                "POST", "POST /complaints/lookup", "/complaints/lookup",
+                json={"complaint_ids": complaint_ids}, retry=True
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"Failed to retrieve complaints: {response.text}"}
+
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    def chat(self, session_id: str, message: str):
+        """Run one chat turn on the server"""
+        try:
+            response = self.request(
+                "POST", "POST /chat", "/chat",
+                json={"session_id": session_id, "message": message}
+            )
+
             if response.status_code == 200:
                 return response.json()
-            elif response.status_code == 404:
-                return {"error": "Complaint not found"}
             else:
-                return {"error": f"Failed to retrieve complaint: {response.text}"}
-        
+                return {"error": f"Failed to get a chat response: {response.text}"}
+
+        except requests.exceptions.RequestException as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    def chat_stream(self, session_id: str, message: str):
+        """Run one chat turn on the server, yielding ("token", text) events and a final ("done", data) event"""
+        try:
+            with self.request(
+                "POST", "POST /chat/stream", "/chat/stream",
+                json={"session_id": session_id, "message": message},
+                headers={"Accept": "text/event-stream"},
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    yield "error", f"Failed to get a chat response: {response.text}"
+                    return
+
+                parser = EventParser()
+                for line in response.iter_lines(decode_unicode=True):
+                    if (item := parser.feed(line)) is not None:
+                        yield item
+
         except requests.exceptions.RequestException as e:
+            yield "error", f"Connection error: {str(e)}"
+
+    def reset_chat(self, session_id: str):
+        """Clear a chat session on the server"""
+        try:
+            self.request("DELETE", "DELETE /chat/{session_id}", f"/chat/{session_id}", retry=True)
+        except requests.exceptions.RequestException:
+            pass
+
+
+class EventParser:
+    """Turns /chat/stream server-sent event lines into ("token", text) / ("done", data) tuples"""
+
+    def __init__(self):
+        self.event = "message"
+
+    def feed(self, line: str):
+        if line.startswith("event:"):
+            self.event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data = json.loads(line[len("data:"):].strip())
+            event, self.event = self.event, "message"
+            if event == "done":
+                return "done", data
+            return "token", data["token"]
+        return None
+
+
+class AsyncAPIClient:
+    """httpx-based asyncio counterpart of APIClient"""
+
+    def __init__(self, base_url=FASTAPI_BASE_URL, connect_timeout=API_CONNECT_TIMEOUT, read_timeout=API_READ_TIMEOUT, max_retries=API_MAX_RETRIES):
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.client = httpx.AsyncClient(
+            base_url=base_url or "",
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=API_POOL_SIZE, max_keepalive_connections=API_POOL_SIZE)
+        )
+        self.latency = LatencyStats()
+        self.etags = ETagCache()
+
+    async def request(self, method: str, endpoint: str, path: str, retry=False, **kwargs):
+        """Send a request, recording latency under endpoint; idempotent calls pass retry=True"""
+        attempts = self.max_retries + 1 if retry else 1
+        with tracer.span(f"client {endpoint}") as span:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **tracer.headers()}
+            for attempt in range(attempts):
+                span.set(attempts=attempt + 1)
+                start = time.perf_counter()
+                try:
+                    response = await self.client.request(method, path, **kwargs)
+                except (httpx.ConnectError, httpx.TimeoutException):
+                    self.latency.observe(endpoint, time.perf_counter() - start)
+                    if attempt == attempts - 1:
+                        raise
+                else:
+                    self.latency.observe(endpoint, time.perf_counter() - start)
+                    if response.status_code not in RETRYABLE_STATUS or attempt == attempts - 1:
+                        span.set(status_code=response.status_code)
+                        return response
+                    await response.aclose()
+                await asyncio.sleep(backoff_delay(attempt))
+
+    def latency_stats(self):
+        """p50/p95/p99 latency per endpoint"""
+        return self.latency.snapshot()
+
+    async def create_complaint(self, complaint_data: dict):
+        """Create a new complaint via API"""
+        try:
+            response = await self.request(
+                "POST", "POST /complaints", "/complaints", json=complaint_data,
+                headers={"Idempotency-Key": str(uuid4())}, retry=True
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"Failed to create complaint: {response.text}"}
+
+        except httpx.HTTPError as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    async def get_complaint(self, complaint_id: str):
+        """Retrieve complaint details by ID"""
+        try:
+            response = await self.request(
+                "GET", "GET /complaints/{complaint_id}", f"/complaints/{complaint_id}",
+                headers=self.etags.headers(complaint_id), retry=True
+            )
+            return self.etags.result(complaint_id, response)
+
+        except httpx.HTTPError as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    async def get_complaints(self, complaint_ids: list):
+        """Retrieve many complaints in one round trip; returns {"complaints": [...], "missing": [...]}"""
+        try:
+            response = await self.request(
+                "POST", "POST /complaints/lookup", "/complaints/lookup",
+                json={"complaint_ids": complaint_ids}, retry=True
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"Failed to retrieve complaints: {response.text}"}
+
+        except httpx.HTTPError as e:
+            return {"error": f"Connection error: {str(e)}"}
+
+    async def chat(self, session_id: str, message: str):
+        """Run one chat turn on the server"""
+        try:
+            response = await self.request(
+                "POST", "POST /chat", "/chat",
+                json={"session_id": session_id, "message": message}
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"Failed to get a chat response: {response.text}"}
+
+        except httpx.HTTPError as e:
             return {"error": f"Connection error: {str(e)}"}
 
+    async def chat_stream(self, session_id: str, message: str):
+        """Run one chat turn on the server, yielding ("token", text) events and a final ("done", data) event"""
+        try:
+            start = time.perf_counter()
+            async with self.client.stream(
+                "POST", "/chat/stream",
+                json={"session_id": session_id, "message": message},
+                headers={"Accept": "text/event-stream", **tracer.headers()}
+            ) as response:
+                self.latency.observe("POST /chat/stream", time.perf_counter() - start)
+                if response.status_code != 200:
+                    yield "error", f"Failed to get a chat response: {(await response.aread()).decode()}"
+                    return
+
+                parser = EventParser()
+                async for line in response.aiter_lines():
+                    if (item := parser.feed(line)) is not None:
+                        yield item
+
+        except httpx.HTTPError as e:
+            yield "error", f"Connection error: {str(e)}"
+
+    async def reset_chat(self, session_id: str):
+        """Clear a chat session on the server"""
+        try:
+            await self.request("DELETE", "DELETE /chat/{session_id}", f"/chat/{session_id}", retry=True)
+        except httpx.HTTPError:
+            pass
+
+    async def aclose(self):
+        await self.client.aclose()
+
 # Create global instance
 api_client = APIClient()
@@ -0,0 +1,100 @@
+"""Cold-start time: importing each module, and starting the FastAPI app until it is ready.
+
+Every measurement runs in a fresh interpreter with no reachable OpenAI, Qdrant or
+MongoDB, so anything that does network work at import time shows up as an error
+or a timeout instead of a number:
+
+    python -m benchmarks.cold_start --repeat 5 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["api_client", "rag_service", "chat_service", "data_store", "main"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Import the app, run its lifespan startup and wait for the readiness probe
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    while (status := client.get("/ready").status_code) == 503 and time.perf_counter() - started < 60:
+        time.sleep(0.005)
+    ready = time.perf_counter()
+print(imported - start, started - start, ready - start, status)
+"""
+
+
+def run(script: str, env: dict):
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return result.stdout.strip().splitlines()[-1].split()
+
+
+def summarize(samples):
+    return {"median_ms": 1000 * statistics.median(samples), "min_ms": 1000 * min(samples), "samples": len(samples)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="support-bot-cold-start-")
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "cold-start",
+        # Nothing listens here, so a network call at import fails fast
+        "OPENAI_BASE_URL": "http://127.0.0.1:9/v1",
+        "QDRANT_URL": "http://127.0.0.1:9",
+        "VECTOR_STORE": "local",
+        "VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "INDEX_MANIFEST_PATH": os.path.join(workdir, "index_manifest.json"),
+        "BM25_INDEX_PATH": os.path.join(workdir, "bm25_index.json"),
+        "EMBEDDING_CACHE_PATH": "",
+        "MONGODB_URL": "mongomock://",
+        "DATABASE_NAME": "cold_start",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+
+    results = {"imports": {}, "startup": {}}
+    for module in MODULES:
+        try:
+            samples = [float(run(IMPORT_SCRIPT.format(module=module), env)[0]) for _ in range(args.repeat)]
+            results["imports"][module] = summarize(samples)
+            print(f"import {module:<14} {results['imports'][module]['median_ms']:8.1f}ms")
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            results["imports"][module] = {"error": str(e)}
+            print(f"import {module:<14} failed: {e}")
+
+    try:
+        rows = [run(STARTUP_SCRIPT, env) for _ in range(args.repeat)]
+        for i, stage in enumerate(("imported", "started", "ready")):
+            results["startup"][stage] = summarize([float(row[i]) for row in rows])
+        results["startup"]["ready_status"] = int(rows[-1][3])
+        print(f"app started          {results['startup']['started']['median_ms']:8.1f}ms")
+        print(f"app ready            {results['startup']['ready']['median_ms']:8.1f}ms (status {results['startup']['ready_status']})")
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        results["startup"] = {"error": str(e)}
+        print(f"app startup failed: {e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
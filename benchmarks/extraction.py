@@ -0,0 +1,112 @@
+"""Microbenchmark: the compiled single-pass extractor against the previous per-call regex helpers.
+
+The legacy functions below reproduce what a chat turn used to run for every
+message: the query intent check (which extracted the complaint ID), a second
+complaint ID extraction, the filing intent check, contact extraction and the
+keyword scans in update_complaint_context.
+
+    python -m benchmarks.extraction --repeat 20000
+"""
+import argparse
+import re
+import time
+
+from extraction import extractor
+
+MESSAGES = [
+    "Hi there",
+    "What are your support hours?",
+    "I want to file a complaint about my delayed order",
+    "John Smith",
+    "My phone number is 9876543210",
+    "you can reach me at john.smith@example.com",
+    "+44 7911 123456",
+    "+91 9876543210",
+    "reach me at problem.solver@example.com",
+    "The delivery arrived damaged and the product does not work at all",
+    "Can you show details for 3f2b9c1e-8d4a-4c6e-9b7f-1a2b3c4d5e6f please?",
+    "what is my complaint status",
+    "I'm not satisfied with the poor service I received last week, the engineer never showed up",
+    "How do I escalate to the Ombudsman if I am unhappy with the outcome?",
+]
+
+
+def legacy_extract_complaint_id(text):
+    patterns = r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b'
+    matches = re.findall(patterns, text)
+    return matches[0] if matches else None
+
+
+def legacy_extract_contact_info(text):
+    info = {}
+    email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
+    if email_match:
+        info['email'] = email_match.group()
+    for pattern in [r'\b\d{10}\b', r'\b\+?\d{1,3}[-.\s]?\d{3,4}[-.\s]?\d{3,4}[-.\s]?\d{3,4}\b']:
+        phone_match = re.search(pattern, text)
+        if phone_match:
+            info['phone_number'] = phone_match.group()
+            break
+    return info
+
+
+def legacy_is_filing_intent(text):
+    keywords = [
+        'complaint', 'complain', 'issue', 'problem', 'file a complaint',
+        'report a problem', 'delayed', 'damaged', 'poor service',
+        'not satisfied', 'unhappy', 'wrong', 'error'
+    ]
+    return any(keyword in text.lower() for keyword in keywords)
+
+
+def legacy_is_query_intent(text):
+    keywords = ['show details', 'check complaint', 'complaint status', 'my complaint', 'complaint id', 'check status']
+    return any(keyword in text.lower() for keyword in keywords) or legacy_extract_complaint_id(text) is not None
+
+
+def legacy_turn(text):
+    """Everything the old chat turn computed from one message"""
+    is_query = legacy_is_query_intent(text)
+    complaint_id = legacy_extract_complaint_id(text)
+    is_filing = legacy_is_filing_intent(text)
+    contact = legacy_extract_contact_info(text)
+    not_name = any(k in text.lower() for k in ['complaint', 'issue', 'problem', 'delayed', 'damaged', '@', 'phone', 'number'])
+    not_name = not_name or re.search(r'@|^\d+$', text) is not None
+    details = any(k in text.lower() for k in ['order', 'delivery', 'service', 'product', 'issue', 'problem'])
+    return is_query, complaint_id, is_filing, contact, not_name, details
+
+
+def compiled_turn(text):
+    extraction = extractor.extract(text)
+    return (
+        extraction.is_query_intent,
+        extraction.complaint_id,
+        extraction.is_filing_intent,
+        extraction.contact_info(),
+        "not_name" in extraction.categories or text.isdigit(),
+        "details" in extraction.categories,
+    )
+
+
+def measure(turn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in MESSAGES:
+            turn(message)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5000, help="passes over the sample messages")
+    args = parser.parse_args()
+
+    mismatches = [message for message in MESSAGES if legacy_turn(message) != compiled_turn(message)]
+    for message in mismatches:
+        print(f"results differ for {message!r}:\n  legacy   {legacy_turn(message)}\n  compiled {compiled_turn(message)}")
+
+    legacy = measure(legacy_turn, args.repeat)
+    compiled = measure(compiled_turn, args.repeat)
+    print(f"legacy   {legacy * 1e6:8.2f} us/message")
+    print(f"compiled {compiled * 1e6:8.2f} us/message")
+    print(f"speedup  {legacy / compiled:8.2f}x")
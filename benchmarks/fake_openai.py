@@ -0,0 +1,148 @@
+"""Local stand-in for the OpenAI embeddings and chat completions APIs.
+
+Run it and point the app at it:
+
+    python -m benchmarks.fake_openai --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python data_store.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_embedding(text: str, dimensions: int = 1536):
+    """Deterministic unit vector derived from the text hash"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    token_latency = 0.0
+    failure_rate = 0.0
+    dimensions = 1536
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}})
+            return
+
+        if self.path.endswith("/embeddings"):
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            dimensions = payload.get("dimensions") or self.dimensions
+            tokens = sum(len(text.split()) for text in inputs)
+            self.send_json(200, {
+                "object": "list",
+                "model": payload.get("model", "text-embedding-3-small"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+            return
+
+        if self.path.endswith("/chat/completions"):
+            question = payload.get("messages", [{}])[-1].get("content", "")
+            words = f"This is a canned answer to: {question}".split()
+            tokens = [word + " " for word in words]
+            model = payload.get("model", "gpt-3.5-turbo")
+            if payload.get("stream"):
+                self.send_stream(model, tokens)
+            else:
+                self.send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+                })
+            return
+
+        self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def send_stream(self, model, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, token in enumerate(tokens + [None]):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": token} if token is not None else {},
+                    "finish_reason": None if token is not None else "stop",
+                }],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if self.token_latency:
+                time.sleep(self.token_latency)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, token_latency=0.0):
+    """Start the fake server on a background thread; port 0 picks a free port (see server.server_port)"""
+    FakeOpenAIHandler.latency = latency
+    FakeOpenAIHandler.token_latency = token_latency
+    FakeOpenAIHandler.failure_rate = failure_rate
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def serve(host="127.0.0.1", port=8001, latency=0.0, failure_rate=0.0, token_latency=0.0):
+    """Start the fake server and block"""
+    server = start(host, port, latency, failure_rate, token_latency)
+    print(f"fake OpenAI listening on http://{host}:{port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed chat tokens")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.latency, args.failure_rate, args.token_latency)
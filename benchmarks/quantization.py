@@ -0,0 +1,138 @@
+"""Memory, latency and recall@k of compact vector storage settings.
+
+Every combination of embedding dimensions and quantization is loaded into a
+LocalVectorStore and searched with the same queries. Recall@k is measured against
+an exact full-precision search over the full-length vectors, so it includes the
+loss from both the shorter embeddings and the quantization:
+
+    python -m benchmarks.quantization --points 100000 --output quantization.json
+    python -m benchmarks.quantization --from-store customer_complaints_collection
+
+Synthetic corpora are clustered unit vectors whose leading dimensions carry most
+of the signal, and queries are noisy copies of corpus points, as questions land
+close to the chunks that answer them. Shorter dimensions are simulated by
+truncating and renormalising, which is how text-embedding-3 models shorten
+vectors; real recall for a dimension count is best checked with --from-store on
+an index built from the real model.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_corpus(points: int, dimensions: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Leading dimensions carry more of the signal, as in text-embedding-3 vectors;
+    # with equal weights every truncation would lose as much as a random projection
+    weights = (1 + np.arange(dimensions, dtype=np.float32) / 64) ** -0.75
+    centres = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    corpus = centres[rng.integers(0, clusters, points)] + 0.6 * rng.standard_normal((points, dimensions), dtype=np.float32)
+    corpus *= weights
+    return corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+
+
+def store_corpus(collection: str):
+    from vector_store import create_vector_store
+
+    return np.array([point.vector for point in create_vector_store(collection=collection).scroll()], dtype=np.float32)
+
+
+def shorten(vectors, dimensions: int):
+    vectors = np.ascontiguousarray(vectors[:, :dimensions])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(directory: str, corpus, quantization: str, oversampling: float):
+    from qdrant_client.http.models import PointStruct
+    from vector_store import LocalVectorStore
+
+    store = LocalVectorStore("bench", size=corpus.shape[1], path=directory, quantization=quantization, oversampling=oversampling)
+    store.recreate()
+    for start in range(0, len(corpus), 10000):
+        # model_construct skips pydantic validation, which dominates building a large store
+        store.upsert([
+            PointStruct.model_construct(id=str(i), vector=vector, payload={})
+            for i, vector in enumerate(corpus[start:start + 10000], start)
+        ])
+    store.flush()
+    return store
+
+
+def measure(store, queries, truth, k: int):
+    # The first search builds the quantized codes, which is a one-off cost per process
+    start = time.perf_counter()
+    store.search(queries[0], k)
+    build_seconds = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = store.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += len({int(result["id"]) for result in results} & set(expected.tolist()))
+    latencies.sort()
+    resident = store.codes.nbytes if store.codes is not None else store.matrix.nbytes
+    return {
+        "full_precision_bytes": store.matrix.nbytes,
+        "resident_bytes": resident,
+        "build_seconds": build_seconds,
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        f"recall@{k}": hits / (k * len(queries)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-store", metavar="COLLECTION", help="use the vectors of this collection instead of a synthetic corpus")
+    parser.add_argument("--points", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--clusters", type=int, default=500, help="topics in the synthetic corpus")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 768, 512, 256])
+    parser.add_argument("--quantization", nargs="+", default=["none", "int8", "binary"])
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 3.0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Exact search only, so the baseline is not an approximate HNSW result
+    os.environ["VECTOR_STORE_HNSW_THRESHOLD"] = str(2 ** 62)
+
+    corpus = store_corpus(args.from_store) if args.from_store else synthetic_corpus(args.points, max(args.dimensions), args.clusters)
+    rng = np.random.default_rng(1)
+    queries = corpus[rng.choice(len(corpus), min(args.queries, len(corpus)), replace=False)]
+    queries = queries + 0.02 * rng.standard_normal(queries.shape, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]
+    print(f"{len(corpus)} points, {corpus.shape[1]} dimensions, {len(queries)} queries, k={args.k}")
+
+    results = {"points": len(corpus), "queries": len(queries), "k": args.k, "settings": []}
+    workdir = tempfile.mkdtemp(prefix="support-bot-quantization-")
+    for dimensions in args.dimensions:
+        if dimensions > corpus.shape[1]:
+            continue
+        vectors = shorten(corpus, dimensions)
+        short_queries = shorten(queries, dimensions)
+        for quantization in args.quantization:
+            for oversampling in (args.oversampling if quantization != "none" else [1.0]):
+                store = build_store(os.path.join(workdir, f"{dimensions}-{quantization}-{oversampling}"), vectors, quantization, oversampling)
+                row = {"dimensions": dimensions, "quantization": quantization, "oversampling": oversampling}
+                row.update(measure(store, short_queries, truth, args.k))
+                results["settings"].append(row)
+                print(f"{dimensions:5d} {quantization:<7} x{oversampling:<4} "
+                      f"resident {row['resident_bytes'] / 2 ** 20:8.1f}MiB  "
+                      f"p50 {row['p50_ms']:7.2f}ms  p95 {row['p95_ms']:7.2f}ms  "
+                      f"recall@{args.k} {row[f'recall@{args.k}']:.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
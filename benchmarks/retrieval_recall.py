@@ -0,0 +1,70 @@
+"""Offline recall@k for the dense, BM25 and hybrid retrievers.
+
+Needs an ingested knowledge base (python data_store.py). Each entry in the
+question set lists one or more phrases from the source document; a question
+counts as recalled at k when any of the top-k chunks contains one of them.
+
+    python -m benchmarks.retrieval_recall --k 1 3 5
+    RERANKER_MODEL=cross-encoder/ms-marco-MiniLM-L-6-v2 python -m benchmarks.retrieval_recall
+"""
+import argparse
+import json
+import os
+import time
+
+from rag_service import rag_service
+
+QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "retrieval_questions.json")
+MODES = ("dense", "sparse", "hybrid")
+
+
+def is_relevant(hit, expected):
+    text = hit["payload"]["text"].lower()
+    return any(phrase.lower() in text for phrase in expected)
+
+
+def evaluate(questions, mode: str, ks):
+    """Recall@k for each k and the mean retrieval latency of one mode"""
+    depth = max(ks)
+    recalled = {k: 0 for k in ks}
+    elapsed = 0.0
+    for item in questions:
+        start = time.perf_counter()
+        hits = rag_service.run(rag_service._retrieve(item["question"], depth, mode=mode))
+        elapsed += time.perf_counter() - start
+        ranks = [rank for rank, hit in enumerate(hits, start=1) if is_relevant(hit, item["expected"])]
+        for k in ks:
+            if ranks and ranks[0] <= k:
+                recalled[k] += 1
+    return {
+        "mode": mode,
+        "questions": len(questions),
+        "recall": {f"@{k}": recalled[k] / len(questions) for k in ks},
+        "mean_latency_ms": 1000 * elapsed / len(questions),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="JSON list of {question, expected: [phrases]}")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        questions = json.load(f)
+
+    results = [evaluate(questions, mode, args.k) for mode in args.modes]
+    print(f"{'mode':<8} " + " ".join(f"{'recall@' + str(k):>10}" for k in args.k) + f" {'latency':>10}")
+    for result in results:
+        print(
+            f"{result['mode']:<8} "
+            + " ".join(f"{result['recall'][f'@{k}']:>10.2f}" for k in args.k)
+            + f" {result['mean_latency_ms']:>8.1f}ms"
+        )
+    print("stage latency:", json.dumps(rag_service.retrieval_stats(), indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"results": results, "stages": rag_service.retrieval_stats()}, f, indent=2)
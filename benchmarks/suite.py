@@ -0,0 +1,307 @@
+"""Offline benchmark and load test for the support bot.
+
+Everything runs in one process against local stand-ins: the fake OpenAI server
+(with configurable latency), the in-process vector store instead of Qdrant and
+mongomock instead of MongoDB. The FastAPI app is served by uvicorn on a free
+port. Results are printed, and written as JSON with --output, so runs can be
+compared before deploying:
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --quick --openai-latency 0.05 --token-latency 0.01
+
+Measured:
+- ingestion: data_store.py throughput on the bundled policy PDF
+- rag: RAGService answer latency and time to first token, sequential and concurrent
+- chat: per-turn latency through APIClient.chat_stream -> /chat/stream, the
+  path the Streamlit app's handle_user_message takes
+- complaints: requests/sec and latency for the /complaints endpoints under concurrent load
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS_PATH = os.path.join(os.path.dirname(__file__), "retrieval_questions.json")
+DOCUMENT_PATH = os.path.join(ROOT, "customer-complaints-management-policy-procedure.pdf")
+
+
+def summarize(samples):
+    """count/mean/p50/p95/p99/max of latency samples, in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return 1000 * ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": 1000 * ordered[-1],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args, workdir: str):
+    """Point every backend at a local stand-in; must run before the app modules are imported"""
+    from benchmarks.fake_openai import start
+
+    fake = start(latency=args.openai_latency, token_latency=args.token_latency)
+    api_port = free_port()
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake.server_port}/v1",
+        "VECTOR_STORE": "local",
+        "VECTOR_STORE_PATH": os.path.join(workdir, "vector_store"),
+        "INDEX_MANIFEST_PATH": os.path.join(workdir, "index_manifest.json"),
+        "BM25_INDEX_PATH": os.path.join(workdir, "bm25_index.json"),
+        "EMBEDDING_CACHE_PATH": "",
+        "MONGODB_URL": "mongomock://",
+        "DATABASE_NAME": "benchmark",
+        "SESSION_STORE": "memory",
+        "TRACE_EXPORTER": "none",
+        "FASTAPI_BASE_URL": f"http://127.0.0.1:{api_port}",
+    })
+    if args.write_batching:
+        os.environ["COMPLAINT_WRITE_BATCHING"] = "true"
+    if not args.response_cache:
+        # Cosine similarity never exceeds 1, so nothing is served from the semantic cache
+        os.environ["RESPONSE_CACHE_THRESHOLD"] = "2"
+    return api_port
+
+
+def start_api(port: int):
+    import requests
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    # Measure a warmed-up app, as a load balancer would only route to it once ready
+    while requests.get(f"http://127.0.0.1:{port}/ready").status_code == 503:
+        time.sleep(0.05)
+    return server
+
+
+def bench_ingestion():
+    from data_store import obj_store_data_vectors
+
+    start = time.perf_counter()
+    rows = obj_store_data_vectors.sync_documents([DOCUMENT_PATH], workers=1, rebuild=True)
+    seconds = time.perf_counter() - start
+    chunks = sum(row.get("chunks", 0) for row in rows)
+    return {
+        "documents": len(rows),
+        "chunks": chunks,
+        "seconds": seconds,
+        "chunks_per_second": chunks / seconds,
+        "embeddings": obj_store_data_vectors.last_throughput,
+        "rows": rows,
+    }
+
+
+def bench_rag(questions, turns: int, concurrency: int):
+    from rag_service import rag_service
+
+    latencies, first_tokens = [], []
+    for i in range(turns):
+        start = time.perf_counter()
+        first = None
+        for _ in rag_service.generate_response_stream(questions[i % len(questions)], {}, []):
+            if first is None:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first)
+
+    async def concurrent():
+        semaphore = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async def one(i):
+            async with semaphore:
+                start = time.perf_counter()
+                await rag_service.agenerate_response(questions[i % len(questions)], {}, [])
+                samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(turns)))
+        return samples, time.perf_counter() - start
+
+    samples, seconds = asyncio.run(concurrent())
+    return {
+        "sequential": {"latency": summarize(latencies), "time_to_first_token": summarize(first_tokens)},
+        "concurrent": {
+            "concurrency": concurrency,
+            "latency": summarize(samples),
+            "turns_per_second": turns / seconds,
+        },
+        "stages": rag_service.retrieval_stats(),
+        "routes": rag_service.route_stats(),
+    }
+
+
+def bench_chat(questions, turns: int):
+    from api_client import APIClient
+
+    client = APIClient()
+    latencies, first_tokens = [], []
+    for i in range(turns):
+        start = time.perf_counter()
+        first = None
+        for event, data in client.chat_stream(f"bench-{i % 4}", questions[i % len(questions)]):
+            if event == "error":
+                raise RuntimeError(data)
+            if event == "token" and first is None:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first)
+    return {"latency": summarize(latencies), "time_to_first_token": summarize(first_tokens)}
+
+
+def bench_complaints(requests: int, concurrency: int):
+    from api_client import AsyncAPIClient
+
+    async def load(client, endpoint: str, make_request):
+        semaphore = asyncio.Semaphore(concurrency)
+        samples, errors, results = [], 0, []
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await make_request(i)
+                samples.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+                results.append(response)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        seconds = time.perf_counter() - start
+        return results, {
+            "endpoint": endpoint,
+            "requests": requests,
+            "errors": errors,
+            "requests_per_second": requests / seconds,
+            "latency": summarize(samples),
+        }
+
+    async def run():
+        client = AsyncAPIClient()
+        try:
+            created, create_stats = await load(client, "POST /complaints", lambda i: client.request(
+                "POST", "POST /complaints", "/complaints", json={
+                    "name": f"Benchmark User {i}",
+                    "phone_number": f"98{i:08d}",
+                    "email": f"user{i % 50}@example.com",
+                    "complaint_details": "Order arrived damaged and late",
+                }, headers={"Idempotency-Key": f"bench-{i}"}
+            ))
+            ids = [response.json()["complaint_id"] for response in created if response.status_code == 200]
+            _, get_stats = await load(client, "GET /complaints/{complaint_id}", lambda i: client.request(
+                "GET", "GET /complaints/{complaint_id}", f"/complaints/{ids[i % len(ids)]}"
+            ))
+            _, list_stats = await load(client, "GET /complaints", lambda i: client.request(
+                "GET", "GET /complaints", "/complaints", params={"email": f"user{i % 50}@example.com", "limit": 20}
+            ))
+            # Replaying the same keys must return the same IDs without inserting again
+            replayed, replay_stats = await load(client, "POST /complaints (replay)", lambda i: client.request(
+                "POST", "POST /complaints", "/complaints", json={
+                    "name": f"Benchmark User {i}",
+                    "phone_number": f"98{i:08d}",
+                    "email": f"user{i % 50}@example.com",
+                    "complaint_details": "Order arrived damaged and late",
+                }, headers={"Idempotency-Key": f"bench-{i}"}
+            ))
+            replay_stats["duplicates_created"] = len(
+                {response.json()["complaint_id"] for response in replayed if response.status_code == 200} - set(ids)
+            )
+            return [create_stats, get_stats, list_stats, replay_stats]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=60, help="chat turns per RAG/chat scenario")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per /complaints endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--openai-latency", type=float, default=0.02, help="seconds the fake OpenAI adds per request")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between fake streamed tokens")
+    parser.add_argument("--response-cache", action="store_true", help="leave the semantic response cache enabled")
+    parser.add_argument("--write-batching", action="store_true", help="group-commit complaint creates (COMPLAINT_WRITE_BATCHING)")
+    parser.add_argument("--quick", action="store_true", help="small run for a smoke check")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+    if args.quick:
+        args.turns, args.requests = 10, 100
+
+    sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix="support-bot-bench-")
+    api_port = configure_environment(args, workdir)
+    with open(QUESTIONS_PATH) as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        }
+    }
+    results["ingestion"] = bench_ingestion()
+    start_api(api_port)
+    results["rag"] = bench_rag(questions, args.turns, args.concurrency)
+    results["chat"] = bench_chat(questions, args.turns)
+    results["complaints"] = bench_complaints(args.requests, args.concurrency)
+    import requests
+    results["caches"] = requests.get(f"http://127.0.0.1:{api_port}/stats").json()["caches"]
+    import complaint_service
+    if complaint_service.batcher is not None:
+        results["complaint_batches"] = {
+            "batch_size": complaint_service.batcher.batch_sizes.snapshot(),
+            "latency": complaint_service.batcher.latency.snapshot(),
+        }
+
+    print(f"ingestion   {results['ingestion']['chunks_per_second']:8.1f} chunks/s")
+    print(f"rag         p50 {results['rag']['sequential']['latency']['p50_ms']:7.1f}ms  "
+          f"p95 {results['rag']['sequential']['latency']['p95_ms']:7.1f}ms  "
+          f"{results['rag']['concurrent']['turns_per_second']:7.1f} turns/s at concurrency {args.concurrency}")
+    print(f"chat        p50 {results['chat']['latency']['p50_ms']:7.1f}ms  "
+          f"p95 {results['chat']['latency']['p95_ms']:7.1f}ms  "
+          f"first token p50 {results['chat']['time_to_first_token']['p50_ms']:7.1f}ms")
+    for stats in results["complaints"]:
+        print(f"{stats['endpoint']:<31} {stats['requests_per_second']:8.1f} req/s  "
+              f"p50 {stats['latency']['p50_ms']:6.1f}ms  p95 {stats['latency']['p95_ms']:6.1f}ms  errors {stats['errors']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
@@ -0,0 +1,182 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, defaultdict
+from settings import *
+from retrieval import payload_matches
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its my of on or
+our so that the their them there these they this to was we what when where which who will with
+you your
+""".split())
+
+
+def tokenize(text: str):
+    """Lowercase alphanumeric terms without stopwords; numbers are kept so "8 weeks" still matches"""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over the indexed chunks.
+
+    Term counts, postings lists and document lengths are computed at ingestion
+    time by data_store.py and written to BM25_INDEX_PATH once per run; readers
+    reload them when that file changes and only derive the IDF table.
+    """
+
+    def __init__(self, path=BM25_INDEX_PATH, collection=COLLECTION_NAME, k1=1.2, b=0.75):
+        self.path = path
+        self.collection = collection
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.loaded_version = None
+        # point_id -> {"source": ..., "payload": {...}, "terms": {term: count}}
+        self.documents = {}
+        # source -> point ids, built when a writer first replaces a document
+        self.by_source = None
+        self.postings = None
+        self.values = {}
+
+    def _version(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """(Re)load the index when the file on disk has changed"""
+        with self.lock:
+            version = self._version()
+            if version == self.loaded_version:
+                return
+            index = {}
+            if version is not None:
+                with open(self.path) as f:
+                    index = json.load(f).get(self.collection, {})
+            self.by_source = None
+            self.postings = None
+            self.values = {}
+            if "postings" in index:
+                self.documents = index["documents"]
+                self._derive(index["postings"], index["lengths"])
+            else:
+                # Written before postings were stored; they are built on the first search
+                self.documents = index
+            self.loaded_version = version
+
+    def sources(self):
+        self.load()
+        return {document["source"] for document in self.documents.values()}
+
+    def field_values(self, fields):
+        """Distinct values of payload fields, e.g. every product in the knowledge base"""
+        self.load()
+        with self.lock:
+            for field in fields:
+                if field not in self.values:
+                    self.values[field] = frozenset(
+                        document["payload"][field] for document in self.documents.values()
+                        if document["payload"].get(field) is not None
+                    )
+            return {field: self.values[field] for field in fields}
+
+    def replace_source(self, source: str, points):
+        """Replace every chunk of one document with (point_id, payload) pairs"""
+        self.load()
+        with self.lock:
+            if self.by_source is None:
+                self.by_source = defaultdict(set)
+                for point_id, document in self.documents.items():
+                    self.by_source[document["source"]].add(point_id)
+            for point_id in self.by_source.pop(source, ()):
+                del self.documents[point_id]
+            for point_id, payload in points:
+                self.documents[str(point_id)] = {
+                    "source": source,
+                    "payload": payload,
+                    "terms": Counter(tokenize(payload["text"])),
+                }
+                self.by_source[source].add(str(point_id))
+            self.postings = None
+            self.values = {}
+
+    def clear(self):
+        with self.lock:
+            self.documents = {}
+            self.by_source = None
+            self.postings = None
+            self.values = {}
+
+    def save(self):
+        """Write the documents with their postings lists; data_store.py calls it once per ingestion run"""
+        with self.lock:
+            if self.postings is not None and self.loaded_version == self._version():
+                # Nothing changed since the file was loaded or written
+                return
+            if self.postings is None:
+                self._build()
+            index = {}
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    index = json.load(f)
+            index[self.collection] = {"documents": self.documents, "postings": self.postings, "lengths": self.lengths}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.path)
+            self.loaded_version = self._version()
+
+    def _build(self):
+        """Postings lists and document lengths from the term counts"""
+        postings = defaultdict(list)
+        lengths = {}
+        for point_id, document in self.documents.items():
+            lengths[point_id] = sum(document["terms"].values())
+            for term, count in document["terms"].items():
+                postings[term].append((point_id, count))
+        self._derive(dict(postings), lengths)
+
+    def _derive(self, postings, lengths):
+        """Average document length and IDF per term"""
+        total = len(lengths)
+        self.average_length = sum(lengths.values()) / total if total else 0.0
+        self.lengths = lengths
+        self.idf = {
+            term: math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            for term, entries in postings.items()
+        }
+        self.postings = postings
+
+    def search(self, query: str, limit: int, filters=None):
+        """Top chunks by BM25 score, as [{"id", "score", "payload"}], optionally only those matching filters"""
+        self.load()
+        with self.lock:
+            if self.postings is None:
+                self._build()
+            allowed = None
+            if filters:
+                allowed = {
+                    point_id for point_id, document in self.documents.items()
+                    if payload_matches(document["payload"], filters)
+                }
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                idf = self.idf.get(term)
+                if idf is None:
+                    continue
+                for point_id, count in self.postings[term]:
+                    if allowed is not None and point_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[point_id] / self.average_length)
+                    scores[point_id] += idf * count * (self.k1 + 1) / (count + norm)
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            return [
+                {"id": point_id, "score": score, "payload": self.documents[point_id]["payload"]}
+                for point_id, score in top
+            ]
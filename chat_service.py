@@ -0,0 +1,200 @@
+import re
+import json
+from datetime import datetime
+from pydantic import ValidationError
+from models import ComplaintCreate
+from rag_service import rag_service
+from extraction import extractor
+from tracing import tracer
+from session_store import create_session_store, new_complaint_context
+from settings import *
+import complaint_service
+
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+NON_DIGITS = re.compile(r'\D')
+
+def validate_email(email):
+    """Validate email format"""
+    return EMAIL_PATTERN.match(email) is not None
+
+def validate_phone(phone):
+    """Validate phone number format"""
+    # Remove any non-digit characters
+    digits_only = NON_DIGITS.sub('', phone)
+    return len(digits_only) >= 10
+
+def extract_missing_fields(context):
+    """Check which fields are missing for complaint creation"""
+    missing = []
+    if not context['name']:
+        missing.append('name')
+    if not context['phone_number']:
+        missing.append('phone number')
+    if not context['email']:
+        missing.append('email address')
+    if not context['complaint_details']:
+        missing.append('complaint details')
+    return missing
+
+def update_complaint_context(user_input, context, extraction=None):
+    """Update complaint context based on user input"""
+    extraction = extraction or extractor.extract(user_input)
+
+    # Extract contact information
+    contact_info = extraction.contact_info()
+    
+    # Update email if found and not already set
+    if 'email' in contact_info and not context['email']:
+        if validate_email(contact_info['email']):
+            context['email'] = contact_info['email']
+    
+    # Update phone if found and not already set
+    if 'phone_number' in contact_info and not context['phone_number']:
+        if validate_phone(contact_info['phone_number']):
+            context['phone_number'] = contact_info['phone_number']
+    
+    # Update name if it looks like a name (simple heuristic)
+    if not context['name']:
+        # If the input is short and doesn't contain typical complaint words, it might be a name
+        words = user_input.strip().split()
+        if len(words) <= 3 and len(user_input) < 50:
+            if "not_name" not in extraction.categories:
+                # Check if it's not a phone number
+                if not user_input.isdigit():
+                    context['name'] = user_input.strip()
+    
+    # Update complaint details if it's descriptive
+    if not context['complaint_details'] and len(user_input) > 20:
+        if "details" in extraction.categories:
+            context['complaint_details'] = user_input.strip()
+
+async def create_complaint_from_context(context):
+    """Create complaint using collected context"""
+    try:
+        complaint = ComplaintCreate(
+            name=context['name'],
+            phone_number=context['phone_number'],
+            email=context['email'],
+            complaint_details=context['complaint_details']
+        )
+    except ValidationError as e:
+        return {"error": f"Failed to create complaint: {e}"}
+
+    complaint_id = await complaint_service.create_complaint(complaint)
+    return {"complaint_id": complaint_id}
+
+def format_complaint_details(complaint):
+    """Format complaint details for display"""
+    created_at = complaint['created_at']
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+    formatted_date = created_at.strftime('%Y-%m-%d %H:%M:%S')
+    
+    return f"""
+**Complaint ID:** {complaint['complaint_id']}  
+**Name:** {complaint['name']}  
+**Phone:** {complaint['phone_number']}  
+**Email:** {complaint['email']}  
+**Details:** {complaint['complaint_details']}  
+**Created At:** {formatted_date}
+"""
+
+
+class ChatService:
+    """Runs chat turns server-side, keeping per-session state in a pluggable store"""
+
+    def __init__(self, store=None):
+        self.store = store or create_session_store()
+
+    async def respond(self, user_input, state):
+        """Process user message; returns a string, or an async token generator for RAG answers"""
+        context = state['complaint_context']
+        extraction = extractor.extract(user_input)
+        
+        # Check if user wants to query complaint details
+        if extraction.is_query_intent:
+            complaint_id = extraction.complaint_id
+            if complaint_id:
+                entry = await complaint_service.get_complaint_entry(complaint_id)
+                if entry is None:
+                    return f"I couldn't find a complaint with ID {complaint_id}. Please check the ID and try again."
+                else:
+                    return f"Here are the details for complaint {complaint_id}:\n\n{format_complaint_details(json.loads(entry['body']))}"
+            else:
+                return "Please provide the complaint ID you'd like me to look up."
+        
+        # Check if user wants to file a complaint
+        if extraction.is_filing_intent or context['collecting_complaint']:
+            context['collecting_complaint'] = True
+            
+            # Update context with any information from the current message
+            update_complaint_context(user_input, context, extraction)
+            
+            # Check what information is still missing
+            missing_fields = extract_missing_fields(context)
+            
+            if missing_fields:
+                # Ask for the next missing field
+                if 'name' in missing_fields:
+                    return "I'm sorry to hear about your issue. To help you file a complaint, I'll need some information. Could you please provide your full name?"
+                elif 'phone number' in missing_fields:
+                    return f"Thank you, {context['name']}. What is your phone number?"
+                elif 'email address' in missing_fields:
+                    return "Got it. Please provide your email address."
+                elif 'complaint details' in missing_fields:
+                    return "Thanks. Could you please provide more details about your complaint?"
+            else:
+                # All information collected, create the complaint
+                result = await create_complaint_from_context(context)
+                
+                if 'error' in result:
+                    return f"I apologize, but there was an error creating your complaint: {result['error']}. Please try again or contact our support team directly."
+                else:
+                    # Reset the complaint context
+                    state['complaint_context'] = new_complaint_context(context.get('language'))
+                    return f"Your complaint has been successfully registered! Your complaint ID is: **{result['complaint_id']}**. You'll hear back from our team soon. Is there anything else I can help you with?"
+        
+        # Generate general response using RAG
+        return rag_service.agenerate_response_stream(user_input, context, state['conversation_history'])
+
+    async def load(self, session_id: str):
+        return await self.store.get(session_id)
+
+    async def stream(self, session_id: str, user_input: str, state=None, language=None):
+        """Run one chat turn, yielding response tokens; the session is saved once the turn completes"""
+        if state is None:
+            state = await self.load(session_id)
+        if language:
+            state['complaint_context']['language'] = language
+        state['conversation_history'].append({"role": "user", "content": user_input})
+
+        # Not activated: the span stays open across yields
+        with tracer.span("chat.turn", activate=False) as span:
+            response = await self.respond(user_input, state)
+            if isinstance(response, str):
+                span.set(handler="direct")
+                yield response
+            else:
+                span.set(handler="rag")
+                parts = []
+                async for token in response:
+                    parts.append(token)
+                    yield token
+                response = "".join(parts)
+
+        state['conversation_history'].append({"role": "assistant", "content": response})
+        state['conversation_history'] = state['conversation_history'][-SESSION_HISTORY_LIMIT:]
+        await self.store.save(session_id, state)
+
+    async def chat(self, session_id: str, user_input: str, language=None):
+        """Run one chat turn and return the full response with the updated complaint context"""
+        state = await self.load(session_id)
+        response = "".join([token async for token in self.stream(session_id, user_input, state, language)])
+        return response, state['complaint_context']
+
+    async def reset(self, session_id: str):
+        await self.store.delete(session_id)
+
+# Create global instance
+chat_service = ChatService()
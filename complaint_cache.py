@@ -0,0 +1,99 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from settings import *
+
+# Cached in place of an entry for IDs that do not exist
+MISSING = "__missing__"
+
+
+class TTLCache:
+    """In-process LRU where every entry also expires after its own TTL"""
+
+    def __init__(self, max_size=COMPLAINT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+class ComplaintCache:
+    """Read-through cache for serialized complaints: in-process tier, then optional Redis tier"""
+
+    def __init__(self, redis_url=COMPLAINT_CACHE_REDIS_URL, ttl=COMPLAINT_CACHE_TTL, negative_ttl=COMPLAINT_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = TTLCache()
+        self.redis = None
+        if redis_url:
+            # Optional dependency, only needed when a Redis-protocol server is configured
+            import redis.asyncio
+            self.redis = redis.asyncio.from_url(redis_url)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def key(self, complaint_id: str):
+        return f"complaint:{complaint_id}"
+
+    async def get(self, complaint_id: str):
+        """Return the cached entry, MISSING for known-unknown IDs, or None on a miss"""
+        key = self.key(complaint_id)
+        value = self.local.get(key)
+        if value is None and self.redis is not None:
+            raw = await self.redis.get(key)
+            if raw is not None:
+                value = MISSING if raw == MISSING.encode() else json.loads(raw)
+                self.local.set(key, value, self.negative_ttl if value == MISSING else self.ttl)
+
+        if value is None:
+            self.misses += 1
+        elif value == MISSING:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, complaint_id: str, entry: dict):
+        key = self.key(complaint_id)
+        self.local.set(key, entry, self.ttl)
+        if self.redis is not None:
+            await self.redis.set(key, json.dumps(entry), ex=self.ttl)
+
+    async def set_missing(self, complaint_id: str):
+        key = self.key(complaint_id)
+        self.local.set(key, MISSING, self.negative_ttl)
+        if self.redis is not None:
+            await self.redis.set(key, MISSING, ex=self.negative_ttl)
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "local_entries": len(self.local.entries),
+        }
+
+# Create global instance
+complaint_cache = ComplaintCache()
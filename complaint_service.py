@@ -0,0 +1,191 @@
+import json
+import base64
+import hashlib
+from uuid import uuid4
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from settings import *
+from models import ComplaintCreate, ComplaintResponse
+from database import complaints_collection
+from complaint_cache import complaint_cache, MISSING
+from tracing import tracer
+from write_batcher import WriteBatcher
+from complaint_similarity import complaint_index
+
+LIST_FIELDS = {"name", "phone_number", "email", "complaint_details"}
+CREATE_FIELDS = ("name", "phone_number", "email", "complaint_details")
+
+# Coalesces concurrent creates into insert_many calls when COMPLAINT_WRITE_BATCHING is on
+batcher = WriteBatcher(complaints_collection) if COMPLAINT_WRITE_BATCHING else None
+
+
+class IdempotencyKeyConflict(Exception):
+    """An Idempotency-Key was reused for a different complaint"""
+
+
+async def ensure_indexes():
+    """Create the indexes the lookup and listing queries rely on"""
+    await complaints_collection.create_indexes([
+        IndexModel([("complaint_id", ASCENDING)], unique=True),
+        # Sparse, so complaints created without an Idempotency-Key do not collide on a null key
+        IndexModel([("idempotency_key", ASCENDING)], unique=True, sparse=True),
+        # Listing sorts newest first with complaint_id as the tie-breaker
+        IndexModel([("created_at", DESCENDING), ("complaint_id", DESCENDING)]),
+        IndexModel([("email", ASCENDING), ("created_at", DESCENDING), ("complaint_id", DESCENDING)]),
+        IndexModel([("phone_number", ASCENDING), ("created_at", DESCENDING), ("complaint_id", DESCENDING)]),
+    ])
+
+
+def build_complaint_doc(complaint: ComplaintCreate):
+    return {
+        "complaint_id": str(uuid4()),
+        "name": complaint.name,
+        "phone_number": complaint.phone_number,
+        "email": complaint.email,
+        "complaint_details": complaint.complaint_details,
+        "created_at": datetime.utcnow()
+    }
+
+
+async def create_complaint(complaint: ComplaintCreate, idempotency_key: str = None):
+    """Store a new complaint and return its ID.
+
+    A retry with the same idempotency_key returns the ID of the complaint the first
+    request created instead of inserting it again.
+    """
+    complaint_doc = build_complaint_doc(complaint)
+    if idempotency_key:
+        complaint_doc["idempotency_key"] = idempotency_key
+
+    try:
+        if batcher is not None:
+            await batcher.insert(complaint_doc)
+        else:
+            with tracer.span("mongo.complaints.insert_one"):
+                await complaints_collection.insert_one(complaint_doc)
+    except DuplicateKeyError:
+        if not idempotency_key:
+            raise
+        return await replay_complaint(complaint, idempotency_key)
+    await complaint_cache.set(complaint_doc["complaint_id"], cache_entry(complaint_doc))
+    complaint_index.enqueue([complaint_doc])
+    return complaint_doc["complaint_id"]
+
+
+async def replay_complaint(complaint: ComplaintCreate, idempotency_key: str):
+    """ID of the complaint already stored under idempotency_key"""
+    with tracer.span("mongo.complaints.find_one"):
+        existing = await complaints_collection.find_one({"idempotency_key": idempotency_key})
+    if existing is None:
+        raise IdempotencyKeyConflict(f"Idempotency-Key {idempotency_key} could not be resolved")
+    if any(existing[field] != getattr(complaint, field) for field in CREATE_FIELDS):
+        raise IdempotencyKeyConflict(f"Idempotency-Key {idempotency_key} was already used for a different complaint")
+    return existing["complaint_id"]
+
+
+async def create_complaints(complaints: list):
+    """Store many complaints with one unordered insert_many; returns (complaint_ids, errors)"""
+    docs = [build_complaint_doc(complaint) for complaint in complaints]
+    failed = {}
+    try:
+        with tracer.span("mongo.complaints.insert_many", documents=len(docs)):
+            await complaints_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Unordered inserts carry on past failures, so only these documents are missing
+        failed = {error["index"]: error.get("errmsg", "write error") for error in e.details.get("writeErrors", [])}
+
+    complaint_ids = []
+    for i, doc in enumerate(docs):
+        if i not in failed:
+            complaint_ids.append(doc["complaint_id"])
+            await complaint_cache.set(doc["complaint_id"], cache_entry(doc))
+    complaint_index.enqueue([doc for i, doc in enumerate(docs) if i not in failed])
+    errors = [{"index": index, "error": message} for index, message in sorted(failed.items())]
+    return complaint_ids, errors
+
+
+async def get_complaint(complaint_id: str):
+    """Fetch a complaint document by ID, or None"""
+    with tracer.span("mongo.complaints.find_one"):
+        return await complaints_collection.find_one({"complaint_id": complaint_id})
+
+
+def cache_entry(complaint_doc):
+    """Serialized response body and its ETag, so cache hits skip validation and encoding"""
+    body = ComplaintResponse(**complaint_doc).model_dump_json()
+    etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+    return {"body": body, "etag": etag}
+
+
+async def get_complaint_entry(complaint_id: str):
+    """Read-through lookup returning {"body", "etag"}, or None for unknown IDs (which are cached too)"""
+    with tracer.span("complaint_cache.get") as span:
+        entry = await complaint_cache.get(complaint_id)
+        span.set(hit=entry is not None)
+    if entry == MISSING:
+        return None
+    if entry is not None:
+        return entry
+
+    complaint = await get_complaint(complaint_id)
+    if complaint is None:
+        await complaint_cache.set_missing(complaint_id)
+        return None
+
+    entry = cache_entry(complaint)
+    await complaint_cache.set(complaint_id, entry)
+    return entry
+
+
+async def get_complaints(complaint_ids: list):
+    """Fetch many complaint documents in one query"""
+    cursor = complaints_collection.find({"complaint_id": {"$in": complaint_ids}})
+    with tracer.span("mongo.complaints.find", documents=len(complaint_ids)):
+        return await cursor.to_list(length=len(complaint_ids))
+
+
+def encode_cursor(doc):
+    position = {"created_at": doc["created_at"].isoformat(), "complaint_id": doc["complaint_id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(position["created_at"]), position["complaint_id"]
+
+
+async def list_complaints(email=None, phone_number=None, created_from=None, created_to=None, fields=None, cursor=None, limit=20):
+    """Page through complaints newest first; returns (documents, next_cursor)"""
+    query = {}
+    if email:
+        query["email"] = email
+    if phone_number:
+        query["phone_number"] = phone_number
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+
+    if cursor:
+        # Keyset pagination: continue strictly after the last document of the previous page
+        created_at, complaint_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "complaint_id": {"$lt": complaint_id}},
+        ]}]}
+
+    projection = {"_id": 0, "complaint_id": 1, "created_at": 1}
+    for field in fields or LIST_FIELDS:
+        projection[field] = 1
+
+    with tracer.span("mongo.complaints.find", documents=limit):
+        docs = await complaints_collection.find(query, projection) \
+            .sort([("created_at", DESCENDING), ("complaint_id", DESCENDING)]) \
+            .limit(limit + 1) \
+            .to_list(length=limit + 1)
+
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,257 @@
+import json
+import asyncio
+import argparse
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from pymongo import ASCENDING
+from settings import *
+from database import complaints_collection
+from vector_store import create_vector_store
+from rag_service import rag_service
+from metrics import LatencyStats, SIZE_BUCKETS
+
+PROJECTION = {"_id": 0, "complaint_id": 1, "complaint_details": 1, "created_at": 1, "status": 1}
+
+
+def complaint_payload(doc):
+    created_at = doc["created_at"]
+    return {
+        "complaint_id": doc["complaint_id"],
+        "complaint_details": doc["complaint_details"],
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+        # Complaints have no lifecycle yet, so every complaint counts as open
+        "status": doc.get("status", "open"),
+    }
+
+
+def cluster_vectors(vectors, threshold=COMPLAINT_CLUSTER_THRESHOLD, block_size=1024):
+    """Leader clustering: lists of row indexes, each starting with its leader.
+
+    The row with the most neighbours above threshold leads a cluster and takes every
+    unassigned row within threshold of it, so all members are near-duplicates of the
+    leader and clusters cannot chain. Similarities are computed block by block, so
+    memory stays at block_size x n.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    count = len(matrix)
+    neighbours = np.empty(count, dtype=np.int64)
+    for start in range(0, count, block_size):
+        neighbours[start:start + block_size] = (matrix[start:start + block_size] @ matrix.T >= threshold).sum(axis=1)
+
+    unassigned = np.ones(count, dtype=bool)
+    clusters = []
+    for leader in np.argsort(-neighbours, kind="stable"):
+        if not unassigned[leader]:
+            continue
+        if neighbours[leader] <= 1:
+            # Rows are visited by neighbour count, so everything left has no near-duplicates
+            clusters.extend([int(i)] for i in np.flatnonzero(unassigned))
+            break
+        candidates = np.flatnonzero(unassigned)
+        similarities = matrix[candidates] @ matrix[leader]
+        close = similarities >= threshold
+        ranked = candidates[close][np.argsort(-similarities[close], kind="stable")]
+        members = [int(leader)] + [int(i) for i in ranked if i != leader]
+        unassigned[members] = False
+        clusters.append(members)
+    return clusters
+
+
+class ComplaintIndex:
+    """Vector index over complaint_details for duplicate detection and triage.
+
+    New complaints are queued by complaint_service and embedded in batches by a
+    background worker, so creating a complaint never waits on OpenAI. Complaints
+    created while the worker is not running are picked up by the backfill command.
+    """
+
+    def __init__(self, collection=COMPLAINT_VECTOR_COLLECTION, batch_size=EMBEDDING_BATCH_SIZE, window=COMPLAINT_INDEX_WINDOW):
+        self.store = create_vector_store(collection=collection)
+        self.batch_size = batch_size
+        self.window = window
+        self.queue = None
+        self.worker = None
+        self.ensured = False
+        # Seconds to embed and upsert one batch, and complaints per batch
+        self.latency = LatencyStats()
+        self.batch_sizes = LatencyStats(SIZE_BUCKETS)
+
+    def start(self):
+        """Run the indexing worker on the current event loop"""
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.get_running_loop().create_task(self.run())
+
+    def enqueue(self, docs):
+        """Queue complaints for indexing; a no-op when the worker is not running"""
+        if self.worker is None or self.worker.done():
+            return
+        for doc in docs:
+            self.queue.put_nowait(doc)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await self.ensure()
+        except Exception as e:
+            print(f"Complaint collection unavailable, retrying on the first batch: {e}")
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.batch_size and (timeout := deadline - loop.time()) > 0:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.index(batch)
+            except Exception as e:
+                print(f"Indexing {len(batch)} complaints failed, run the backfill to catch up: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def close(self):
+        """Index whatever is still queued, then stop the worker"""
+        if self.worker is None:
+            return
+        if not self.worker.done():
+            await self.queue.join()
+        self.worker.cancel()
+        self.worker = None
+
+    async def index(self, docs):
+        """Embed and upsert complaints, returns how many were indexed"""
+        from qdrant_client.http.models import PointStruct
+        start = time.perf_counter()
+        await self.ensure()
+        vectors = await rag_service.aembed_texts([doc["complaint_details"] for doc in docs])
+        points = [
+            PointStruct(id=doc["complaint_id"], vector=vector, payload=complaint_payload(doc))
+            for doc, vector in zip(docs, vectors)
+        ]
+        await asyncio.to_thread(self.upsert, points)
+        self.latency.observe("index", time.perf_counter() - start)
+        self.batch_sizes.observe("documents", len(points))
+        return len(points)
+
+    def _ensure(self):
+        # Points are built with qdrant_client's PointStruct, which takes about a second to import
+        import qdrant_client.http.models
+        self.store.ensure()
+        # Similar complaints are searched among open ones only
+        self.store.create_payload_index("status")
+
+    async def ensure(self):
+        """Create the collection if it is missing"""
+        if not self.ensured:
+            await asyncio.to_thread(self._ensure)
+            self.ensured = True
+
+    def upsert(self, points):
+        self.store.upsert(points)
+        self.store.flush()
+
+    async def vectors(self, docs):
+        """Vectors for complaints, indexing the ones that are not in the index yet"""
+        vectors = await asyncio.to_thread(self.store.retrieve, [doc["complaint_id"] for doc in docs])
+        missing = [doc for doc in docs if doc["complaint_id"] not in vectors]
+        for start in range(0, len(missing), self.batch_size):
+            await self.index(missing[start:start + self.batch_size])
+        if missing:
+            vectors.update(await asyncio.to_thread(self.store.retrieve, [doc["complaint_id"] for doc in missing]))
+        return vectors
+
+    async def similar(self, complaint_id: str, limit: int = 5, min_score: float = 0.0):
+        """Most similar open complaints, best first; None when the complaint does not exist"""
+        doc = await complaints_collection.find_one({"complaint_id": complaint_id}, PROJECTION)
+        if doc is None:
+            return None
+        vector = (await self.vectors([doc]))[complaint_id]
+        # Closed complaints are filtered out by the search; one extra hit makes up for the complaint itself
+        hits = await self.store.asearch(vector, limit + 1, {"status": "open"})
+        similar = [
+            {
+                "complaint_id": hit["id"],
+                "score": hit["score"],
+                "complaint_details": hit["payload"]["complaint_details"],
+                "created_at": hit["payload"]["created_at"],
+            }
+            for hit in hits
+            if hit["id"] != complaint_id and hit["score"] >= min_score
+        ]
+        return similar[:limit]
+
+    async def backfill(self, since: datetime = None, rebuild=False):
+        """Index stored complaints, oldest first; returns how many were indexed"""
+        if rebuild:
+            await asyncio.to_thread(self.store.recreate)
+            self.ensured = True
+        query = {"created_at": {"$gte": since}} if since else {}
+        cursor = complaints_collection.find(query, PROJECTION).sort("created_at", ASCENDING)
+        indexed = 0
+        batch = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) == self.batch_size:
+                indexed += await self.index(batch)
+                batch = []
+                print(f"{indexed} complaints indexed")
+        if batch:
+            indexed += await self.index(batch)
+        return indexed
+
+    async def clusters(self, day: date, threshold=COMPLAINT_CLUSTER_THRESHOLD, min_size=2):
+        """Groups of near-duplicate complaints filed on one day (UTC), largest first"""
+        start = datetime.combine(day, datetime.min.time())
+        docs = await complaints_collection.find(
+            {"created_at": {"$gte": start, "$lt": start + timedelta(days=1)}}, PROJECTION
+        ).to_list(length=None)
+        if not docs:
+            return []
+        vectors = await self.vectors(docs)
+        clusters = cluster_vectors([vectors[doc["complaint_id"]] for doc in docs], threshold)
+        groups = [
+            {
+                "size": len(members),
+                "leader": complaint_payload(docs[members[0]]),
+                "complaint_ids": [docs[i]["complaint_id"] for i in members],
+            }
+            for members in clusters if len(members) >= min_size
+        ]
+        return sorted(groups, key=lambda group: -group["size"])
+
+
+# Create global instance
+complaint_index = ComplaintIndex()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Complaint similarity index: backfill it or cluster a day's complaints")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="embed complaints already stored in MongoDB")
+    backfill.add_argument("--since", type=datetime.fromisoformat, help="only complaints created at or after this time")
+    backfill.add_argument("--rebuild", action="store_true", help="drop and recreate the complaint collection first")
+    cluster = commands.add_parser("cluster", help="group one day's complaints into near-duplicate clusters")
+    cluster.add_argument("--date", type=date.fromisoformat, default=datetime.utcnow().date(), help="UTC day, default today")
+    cluster.add_argument("--threshold", type=float, default=COMPLAINT_CLUSTER_THRESHOLD, help="minimum cosine similarity to a cluster's leader")
+    cluster.add_argument("--min-size", type=int, default=2, help="smallest cluster to report")
+    cluster.add_argument("--output", help="write the clusters to this JSON file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "backfill":
+        indexed = asyncio.run(complaint_index.backfill(args.since, args.rebuild))
+        print(f"{indexed} complaints indexed in {time.perf_counter() - start:.2f}s")
+    else:
+        groups = asyncio.run(complaint_index.clusters(args.date, args.threshold, args.min_size))
+        for group in groups:
+            print(f"{group['size']:5d}  {group['leader']['complaint_details'][:80]}")
+        print(f"{len(groups)} clusters, {sum(group['size'] for group in groups)} complaints in {time.perf_counter() - start:.2f}s")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(groups, f, indent=2)
@@ -1,99 +1,512 @@
 from settings import *
+import os
+import sys
+import glob
+import json
+import argparse
 import uuid
-from qdrant_client.http.models import PointStruct
-from PyPDF2 import PdfReader
-from qdrant_client import QdrantClient, models
-from langchain.text_splitter import CharacterTextSplitter
-from openai import OpenAI
+import hashlib
+import time
+import random
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from embedding_cache import embedding_cache, embedding_params, cache_model
+from vector_store import create_vector_store
+from bm25_index import BM25Index
+from retrieval import METADATA_FIELDS
 
-openai_client = OpenAI(
-    api_key=OPENAI_API_KEY
-)
+# openai, langchain, PyPDF2 and qdrant_client are imported on first use, so importing
+# this module (e.g. from a benchmark or a pool worker) stays cheap and does no I/O
 
 
-client = QdrantClient(
-    url=QDRANT_URL, 
-    api_key=QDRANT_KEY,
-    timeout=60
-)
+def retryable_errors():
+    """OpenAI errors an embedding batch is retried on"""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+
+vector_store = create_vector_store()
+sparse_index = BM25Index()
 
 
 class store_data_vectors:
 
     def __init__(self):
-        pass
+        self.last_throughput = {}
+        self._text_splitter = None
+        self._openai = None
+
+    @property
+    def text_splitter(self):
+        if self._text_splitter is None:
+            from langchain.text_splitter import CharacterTextSplitter
+            self._text_splitter = CharacterTextSplitter(
+                separator="\n",
+                chunk_size=1000,
+                chunk_overlap=200,
+            )
+        return self._text_splitter
+
+    @property
+    def openai(self):
+        if self._openai is None:
+            from openai import AsyncOpenAI
+            # Retries are handled per batch in embed_batch
+            self._openai = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                max_retries=0
+            )
+        return self._openai
 
     def create_collection(self):
-        client.recreate_collection(
-            collection_name="customer_complaints_collection",
-            vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
-        )
+        vector_store.recreate()
+        self.create_payload_indexes()
 
-    def create_data_chunks(self,text:str):
+    def ensure_collection(self):
+        """Create the collection if it is missing, returns True when it was created"""
+        created = vector_store.ensure()
+        self.create_payload_indexes()
+        return created
+
+    def create_payload_indexes(self):
+        """Keyword indexes on the metadata searches filter by, so several knowledge bases can share the collection"""
+        for field in METADATA_FIELDS:
+            vector_store.create_payload_index(field)
+
+    def document_metadata(self, file_path, defaults=None):
+        """product/version/language of a document: the defaults, overridden by a JSON file beside it (manual.pdf -> manual.json)"""
+        metadata = {"language": DOCUMENT_LANGUAGE, **(defaults or {})}
+        sidecar_path = f"{os.path.splitext(file_path)[0]}.json"
+        if os.path.exists(sidecar_path):
+            with open(sidecar_path) as f:
+                metadata.update(json.load(f))
+        # Stored as strings: they are matched as keywords
+        return {
+            field: str(value) for field, value in metadata.items()
+            if field in METADATA_FIELDS and field != "source" and value not in (None, "")
+        }
+
+    def point_id(self, source: str, chunk: str):
+        """Deterministic point ID from the document name and chunk content"""
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}:{self.chunk_hash(chunk)}"))
+
+    def chunk_hash(self, chunk: str):
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+    def file_hash(self, file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as data:
+            for block in iter(lambda: data.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load_manifest(self):
+        """Indexed documents for the current collection, keyed by source"""
+        if not os.path.exists(INDEX_MANIFEST_PATH):
+            return {}
+        with open(INDEX_MANIFEST_PATH) as f:
+            return json.load(f).get(COLLECTION_NAME, {})
+
+    def manifest_exists(self):
+        """Whether the manifest has ever recorded this collection, even with no documents yet"""
+        if not os.path.exists(INDEX_MANIFEST_PATH):
+            return False
+        with open(INDEX_MANIFEST_PATH) as f:
+            return COLLECTION_NAME in json.load(f)
+
+    def prepare_collection(self, rebuild=False):
+        """Create or check the collection before a sync, so the manifest matches what it holds"""
+        if rebuild:
+            self.create_collection()
+            self.reset_manifest()
+        elif self.ensure_collection():
+            # The collection was (re)created outside of this manifest
+            self.reset_manifest()
+        elif not self.manifest_exists() and vector_store.count():
+            # Built before the manifest existed: its chunks belong to no source, so a sync
+            # would add every document again next to them instead of replacing them
+            raise ValueError(
+                f"{COLLECTION_NAME} holds points that no index manifest records, "
+                "rebuild it with data_store.py --rebuild"
+            )
+        else:
+            self.ensure_sparse_index()
+
+    def save_manifest(self, documents):
+        manifest = {}
+        if os.path.exists(INDEX_MANIFEST_PATH):
+            with open(INDEX_MANIFEST_PATH) as f:
+                manifest = json.load(f)
+        manifest[COLLECTION_NAME] = documents
+        self.write_manifest(manifest)
 
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=1000,
-            chunk_overlap=200,
+    def reset_manifest(self):
+        """Forget every indexed document, after the collection has been (re)created"""
+        self.save_manifest({})
+        sparse_index.clear()
+        sparse_index.save()
+
+    def ensure_sparse_index(self):
+        """Rebuild the BM25 index from the vector store if it is missing documents in the manifest"""
+        if set(self.load_manifest()) <= sparse_index.sources():
+            return
+        print("BM25 index is out of date, rebuilding it from the vector store")
+        sources = {}
+        unsourced = 0
+        for point in vector_store.scroll():
+            source = (point.payload or {}).get("source")
+            if source is None:
+                # Indexed before chunks recorded their document; only a rebuild can attribute them
+                unsourced += 1
+                continue
+            sources.setdefault(source, []).append((point.id, point.payload))
+        if unsourced:
+            print(f"Skipped {unsourced} points without a source; run with --rebuild to add them to the BM25 index")
+        sparse_index.clear()
+        for source, points in sources.items():
+            sparse_index.replace_source(source, points)
+        sparse_index.save()
+
+    def is_current(self, entry, file_hash, metadata):
+        """Whether a manifest entry already holds this file, with these metadata, embedded by the configured model"""
+        return (
+            entry is not None and entry["file_sha256"] == file_hash and entry.get("metadata") == metadata
+            and entry.get("embedding_model") == cache_model()
         )
 
-        chunks=text_splitter.split_text(text)
+    def update_manifest_entry(self, source, entry):
+        """Record one document as indexed, leaving the others untouched"""
+        documents = self.load_manifest()
+        documents[source] = entry
+        self.save_manifest(documents)
+
+    def write_manifest(self, manifest):
+        tmp_path = f"{INDEX_MANIFEST_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, INDEX_MANIFEST_PATH)
+
+    def create_data_chunks(self,text:str):
+
+        chunks=self.text_splitter.split_text(text)
 
         return chunks
+
+    def iter_pages(self, file_path):
+        """Yield (page_number, text) one page at a time"""
+        from PyPDF2 import PdfReader
+        with open(file_path,'rb') as data:
+
+            Pdf_reader = PdfReader(data)
+
+            for page_number, page in enumerate(Pdf_reader.pages, start=1):
+                yield page_number, page.extract_text() or ""
+
+    def iter_chunks(self, pages):
+        """Split each page into chunks, yielding (chunk, metadata) with page number and offset"""
+        for page_number, text in pages:
+            offset = 0
+            for chunk in self.create_data_chunks(text):
+                found = text.find(chunk, offset)
+                if found != -1:
+                    offset = found
+                yield chunk, {"page": page_number, "offset": offset}
+
+    def iter_batches(self, items, size):
+        """Group any iterable into lists of at most size items"""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
     
-    def create_embeddings(self,text_chunk):
+    async def embed_batch(self, batch, semaphore, max_retries=EMBEDDING_MAX_RETRIES):
+        """Embed one batch of chunks, retrying with exponential backoff"""
+        errors = retryable_errors()
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                try:
+                    response = await self.openai.embeddings.create(
+                        input=batch,
+                        model=EMBEDDING_MODEL,
+                        **embedding_params()
+                    )
+                    vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+                    tokens = response.usage.total_tokens if response.usage else 0
+                    return vectors, tokens
+                except errors as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                    print(f"embedding batch failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
 
-        points = []
-        for id, chunk in enumerate(text_chunk):
+    async def create_embeddings_async(self, text_chunk, source="", metadata=None, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY, semaphore=None):
+        """Embed chunks in batches with a bounded number of concurrent requests"""
+        from qdrant_client.http.models import PointStruct
+        semaphore = semaphore or asyncio.Semaphore(concurrency)
+        vectors = embedding_cache.get_many(cache_model(), text_chunk)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
 
-            
-            response = openai_client.embeddings.create(
-                input=chunk,
-                model="text-embedding-3-small"
-            )
-            vectors = response.data[0].embedding
-            point_id = str(uuid.uuid4())
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.embed_batch([text_chunk[i] for i in batch], semaphore) for batch in batches)
+        )
+        elapsed = time.perf_counter() - start
+
+        total_tokens = 0
+        for batch, (batch_vectors, tokens) in zip(batches, results):
+            total_tokens += tokens
+            embedding_cache.put_many(cache_model(), [text_chunk[i] for i in batch], batch_vectors)
+            for i, vector in zip(batch, batch_vectors):
+                vectors[i] = vector
+
+        points = []
+        metadata = metadata or [{}] * len(text_chunk)
+        for chunk, vector, meta in zip(text_chunk, vectors, metadata):
+            point_id = self.point_id(source, chunk)
+            points.append(PointStruct(id=point_id,vector=vector,payload={"text":chunk,"source":source,**meta}))
 
-            points.append(PointStruct(id=point_id,vector=vectors,payload={"text":chunk}))
-        print("embeddings created")
+        self.last_throughput = {
+            "chunks": len(points),
+            "cached": len(points) - len(missing),
+            "batches": len(batches),
+            "tokens": total_tokens,
+            "seconds": elapsed,
+            "chunks_per_sec": len(missing) / elapsed if elapsed else 0.0,
+            "tokens_per_sec": total_tokens / elapsed if elapsed else 0.0,
+        }
+        print(
+            f"embeddings created: {len(points)} chunks ({len(points) - len(missing)} cached) in {len(batches)} batches, "
+            f"{elapsed:.2f}s ({self.last_throughput['chunks_per_sec']:.1f} chunks/sec, "
+            f"{self.last_throughput['tokens_per_sec']:.0f} tokens/sec)"
+        )
         return points
+
+    def create_embeddings(self,text_chunk, source="", metadata=None, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY):
+
+        return asyncio.run(self.create_embeddings_async(text_chunk, source, metadata, batch_size, concurrency))
     
 
     def extract_text_from_pdf(self,file_path):
 
-        text = ""
+        return "".join(text for _, text in self.iter_pages(file_path))
+    
 
-        with open(file_path,'rb') as data:
 
-            Pdf_reader = PdfReader(data)
+    def insert_data(self, points):
 
-            for page in Pdf_reader.pages:
-                text+=page.extract_text()
-        
+        vector_store.upsert(points)
 
-        return text
-    
+    def delete_points(self, point_ids):
 
+        vector_store.delete(point_ids)
 
-    def insert_data(self, points):
+    async def index_chunks(self, source, chunks, existing, semaphore=None):
+        """Embed and upsert chunks whose point IDs are not already indexed"""
+        seen = set()
+        chunk_ids = []
+        sparse_points = []
+        timings = {"embed_seconds": 0.0, "upsert_seconds": 0.0, "upserted": 0}
 
-        client.upsert(
-            collection_name="customer_complaints_collection",
-            points = points
-        )
+        # Enough chunks to keep every concurrent embedding request busy
+        window = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
+        for window_chunks in self.iter_batches(chunks, window):
+            new_chunks = []
+            new_metadata = []
+            for chunk, meta in window_chunks:
+                point_id = self.point_id(source, chunk)
+                if point_id in seen:
+                    continue
+                seen.add(point_id)
+                chunk_ids.append(point_id)
+                sparse_points.append((point_id, {"text": chunk, "source": source, **meta}))
+                if point_id not in existing:
+                    new_chunks.append(chunk)
+                    new_metadata.append(meta)
+
+            if not new_chunks:
+                continue
+            start = time.perf_counter()
+            points = await self.create_embeddings_async(new_chunks, source, new_metadata, semaphore=semaphore)
+            timings["embed_seconds"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for upsert_batch in self.iter_batches(points, UPSERT_BATCH_SIZE):
+                await asyncio.to_thread(self.insert_data, upsert_batch)
+            timings["upsert_seconds"] += time.perf_counter() - start
+            timings["upserted"] += len(points)
+
+        return chunk_ids, sparse_points, timings
+
+    async def sync_document_async(self, file_path, file_hash=None, chunks=None, semaphore=None, metadata=None):
+        """Stream pages -> chunks -> embedding batches -> upsert batches, skipping unchanged chunks"""
+        source = os.path.basename(file_path)
+        file_hash = file_hash or self.file_hash(file_path)
+        metadata = self.document_metadata(file_path) if metadata is None else metadata
+        entry = self.load_manifest().get(source)
+        if self.is_current(entry, file_hash, metadata):
+            print(f"{source} unchanged, skipping")
+            return {"file": file_path, "status": "unchanged"}
+
+        # Point IDs only depend on the text, so new metadata or a new embedding model means rewriting every chunk
+        reusable = entry and entry.get("metadata") == metadata and entry.get("embedding_model") == cache_model()
+        existing = set(entry["points"]) if reusable else set()
+        if chunks is None:
+            chunks = self.iter_chunks(self.iter_pages(file_path))
+        chunks = ((chunk, {**meta, **metadata}) for chunk, meta in chunks)
+        chunk_ids, sparse_points, timings = await self.index_chunks(source, chunks, existing, semaphore)
+
+        stale = set(entry["points"]) - set(chunk_ids) if entry else set()
+        if stale:
+            await asyncio.to_thread(self.delete_points, stale)
+        await asyncio.to_thread(vector_store.flush)
+        # Saved once at the end of the run; if it never gets there, ensure_sparse_index
+        # finds the documents missing from the BM25 index and rebuilds it
+        sparse_index.replace_source(source, sparse_points)
+
+        self.update_manifest_entry(source, {"file_sha256": file_hash, "metadata": metadata, "embedding_model": cache_model(), "points": chunk_ids})
+        upserted = timings["upserted"]
+        print(f"{source}: {upserted} chunks upserted, {len(stale)} stale chunks deleted, {len(chunk_ids) - upserted} unchanged")
+        return {
+            "file": file_path,
+            "status": "synced",
+            "chunks": len(chunk_ids),
+            "deleted": len(stale),
+            **timings,
+        }
+
+    def sync_document(self, file_path, defaults=None):
+
+        self.prepare_collection()
+        try:
+            return asyncio.run(self.sync_document_async(file_path, metadata=self.document_metadata(file_path, defaults)))
+        finally:
+            sparse_index.save()
+
+    async def sync_documents_async(self, file_paths, workers=None, defaults=None):
+        """Parse PDFs in a process pool and feed them through one shared embedding/upsert stage"""
+        workers = workers or os.cpu_count() or 1
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+        # Bound how many parsed documents wait in memory for the embedding stage
+        in_flight = asyncio.Semaphore(workers * 2)
+        loop = asyncio.get_running_loop()
+        documents = self.load_manifest()
+
+        async def sync_one(pool, file_path):
+            start = time.perf_counter()
+            try:
+                file_hash = await asyncio.to_thread(self.file_hash, file_path)
+                metadata = self.document_metadata(file_path, defaults)
+                entry = documents.get(os.path.basename(file_path))
+                if self.is_current(entry, file_hash, metadata):
+                    return {"file": file_path, "status": "unchanged", "total_seconds": time.perf_counter() - start}
+
+                async with in_flight:
+                    chunks, parse_seconds = await loop.run_in_executor(pool, parse_document, file_path)
+                    row = await self.sync_document_async(file_path, file_hash, chunks, semaphore, metadata)
+                row["parse_seconds"] = parse_seconds
+            except Exception as e:
+                print(f"{file_path} failed: {e}")
+                row = {"file": file_path, "status": "failed", "error": str(e)}
+            row["total_seconds"] = time.perf_counter() - start
+            return row
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return await asyncio.gather(*(sync_one(pool, file_path) for file_path in file_paths))
+
+    def sync_documents(self, file_paths, workers=None, rebuild=False, defaults=None):
+        """Ingest many PDFs; documents already in the manifest are skipped, so reruns resume.
+
+        defaults holds the product/version/language of documents that have no metadata file.
+        """
+        self.prepare_collection(rebuild)
+        try:
+            return asyncio.run(self.sync_documents_async(file_paths, workers, defaults))
+        finally:
+            sparse_index.save()
 
     
-    def main(self,file_path):
+    def main(self,file_path, rebuild=False):
+
+        if rebuild:
+            self.create_collection()
+            self.reset_manifest()
+        self.sync_document(file_path)
 
 
-        self.create_collection()
-        get_data= self.extract_text_from_pdf(file_path)
-        chunks = self.create_data_chunks(get_data)
-        embedding = self.create_embeddings(chunks)
-        self.insert_data(embedding)
+def parse_document(file_path):
+    """Extract and chunk one PDF; runs inside the process pool"""
+    start = time.perf_counter()
+    chunks = list(obj_store_data_vectors.iter_chunks(obj_store_data_vectors.iter_pages(file_path)))
+    return chunks, time.perf_counter() - start
+
+
+def expand_paths(patterns):
+    """Resolve files, directories and glob patterns into a sorted list of PDFs"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.pdf")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path):
+                paths.add(os.path.normpath(path))
+    return sorted(paths)
+
+
+def print_report(rows):
+    print(f"{'file':<50} {'status':<10} {'chunks':>7} {'upserted':>9} {'parse':>8} {'embed':>8} {'upsert':>8} {'total':>8}")
+    for row in rows:
+        print(
+            f"{os.path.basename(row['file'])[:50]:<50} {row['status']:<10} "
+            f"{row.get('chunks', 0):>7} {row.get('upserted', 0):>9} "
+            f"{row.get('parse_seconds', 0.0):>7.2f}s {row.get('embed_seconds', 0.0):>7.2f}s "
+            f"{row.get('upsert_seconds', 0.0):>7.2f}s {row.get('total_seconds', 0.0):>7.2f}s"
+        )
+
     
 obj_store_data_vectors = store_data_vectors()
 
-obj_store_data_vectors.main("customer-complaints-management-policy-procedure.pdf")
 
-    
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest PDF documents into the vector database")
+    parser.add_argument("paths", nargs="*", default=["customer-complaints-management-policy-procedure.pdf"],
+                        help="PDF files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="processes used for PDF parsing")
+    parser.add_argument("--rebuild", action="store_true", help="drop and recreate the collection first")
+    parser.add_argument("--report", help="write the per-file timing report to this JSON file")
+    parser.add_argument("--product", help="product the documents cover, unless a document's metadata file says otherwise")
+    parser.add_argument("--version", help="product version the documents cover")
+    parser.add_argument("--language", help=f"language of the documents (default {DOCUMENT_LANGUAGE})")
+    args = parser.parse_args()
+
+    file_paths = expand_paths(args.paths)
+    if not file_paths:
+        sys.exit("No PDF files matched")
+    sources = [os.path.basename(path) for path in file_paths]
+    duplicates = sorted({source for source in sources if sources.count(source) > 1})
+    if duplicates:
+        sys.exit(f"Documents are identified by file name, found duplicates: {', '.join(duplicates)}")
+
+    start = time.perf_counter()
+    defaults = {field: getattr(args, field) for field in ("product", "version", "language") if getattr(args, field)}
+    try:
+        rows = obj_store_data_vectors.sync_documents(file_paths, args.workers, args.rebuild, defaults)
+    except ValueError as e:
+        sys.exit(str(e))
+    print_report(rows)
+    print(f"{len(rows)} files in {time.perf_counter() - start:.2f}s")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
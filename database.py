@@ -2,7 +2,13 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.collection import Collection
 from settings import *
 MONGO_URL = MONGODB_URL
-client = AsyncIOMotorClient(MONGO_URL)
+if MONGO_URL and MONGO_URL.startswith("mongomock://"):
+    # In-process stand-in for local runs and benchmarks (pip install mongomock-motor)
+    from mongomock_motor import AsyncMongoMockClient
+    client = AsyncMongoMockClient()
+else:
+    client = AsyncIOMotorClient(MONGO_URL)
 
 db = client.complaint_db
 complaints_collection: Collection = db.get_collection(DATABASE_NAME)
+sessions_collection: Collection = db.get_collection("chat_sessions")
@@ -0,0 +1,185 @@
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from settings import *
+
+# Disk hits whose last_used is buffered before one UPDATE batch writes them
+TOUCH_BATCH = 256
+
+
+def normalize_text(text: str):
+    """Collapse whitespace so trivially different inputs share a cache entry"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def cache_key(model: str, text: str):
+    """Content-addressed key for an embedding"""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+def embedding_params(dimensions=EMBEDDING_DIMENSIONS):
+    """Extra embeddings.create arguments, asking for shortened vectors when EMBEDDING_DIMENSIONS is set"""
+    return {"dimensions": dimensions} if dimensions else {}
+
+
+def cache_model(model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+    """Cache namespace of a model, so vectors of different lengths never mix"""
+    return f"{model}/{dimensions}" if dimensions else model
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: an in-process LRU backed by SQLite on disk"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, memory_size=EMBEDDING_CACHE_MEMORY_SIZE, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path = path
+        self.db = None
+        self.rows = 0
+        # Recency of disk hits, written with the next put or once enough have piled up
+        self.touched = {}
+
+    def _connect(self):
+        """Open the SQLite tier on first use, so importing the module does no I/O"""
+        if self.db is None and self.path:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+            self.db.commit()
+            self.rows = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self.db
+
+    def _write_touched(self):
+        if self.touched:
+            self.db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self.touched.items()]
+            )
+            self.touched = {}
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: list):
+        """Return cached vectors in input order, with None for misses"""
+        keys = [cache_key(model, text) for text in texts]
+        results = [None] * len(keys)
+        disk_lookup = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    results[i] = self.memory[key]
+                    self.hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._connect() is not None:
+                found = {}
+                pending = list(disk_lookup)
+                for start in range(0, len(pending), 500):
+                    batch = pending[start:start + 500]
+                    rows = self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array('f', blob).tolist()
+
+                if found:
+                    now = time.time()
+                    self.touched.update((key, now) for key in found)
+                    if len(self.touched) >= TOUCH_BATCH:
+                        self._write_touched()
+                        self.db.commit()
+
+                for key, vector in found.items():
+                    self._remember(key, vector)
+                    for i in disk_lookup.pop(key):
+                        results[i] = vector
+                        self.hits += 1
+                        self.disk_hits += 1
+
+            self.misses += sum(len(indexes) for indexes in disk_lookup.values())
+
+        return results
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        """Store vectors for texts in both tiers"""
+        now = time.time()
+        rows = {}
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(model, text)
+                self._remember(key, vector)
+                rows[key] = (key, array('f', vector).tobytes(), now)
+
+            if rows and self._connect() is not None:
+                keys = list(rows)
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    existing = self.db.execute(
+                        f"SELECT COUNT(*) FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchone()[0]
+                    self.rows += len(batch) - existing
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    rows.values()
+                )
+                self._write_touched()
+                self._evict()
+                self.db.commit()
+
+    def _evict(self):
+        overflow = self.rows - self.max_entries
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.rows -= overflow
+            self.evictions += overflow
+
+    def get(self, model: str, text: str):
+        return self.get_many(model, [text])[0]
+
+    def put(self, model: str, text: str, vector: list):
+        self.put_many(model, [text], [vector])
+
+    def stats(self):
+        """Hit/miss counters for both tiers"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.hits - self.disk_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "evictions": self.evictions,
+        }
+
+# Create global instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,187 @@
+import re
+
+COMPLAINT_ID_PATTERN = r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b'
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+PHONE_PATTERN = (
+    r'\b\d{10}\b'  # 10 digits
+    r'|\b\+?\d{1,3}[-.\s]?\d{3,4}[-.\s]?\d{3,4}[-.\s]?\d{3,4}\b'  # International format
+)
+DIGIT = re.compile(r'\d')
+# A bare 10-digit number anywhere in the message beats any international-looking match
+TEN_DIGITS = re.compile(r'\b\d{10}\b')
+
+KEYWORD_GROUPS = {
+    # User wants to file a complaint
+    "filing": [
+        'complaint', 'complain', 'issue', 'problem', 'file a complaint',
+        'report a problem', 'delayed', 'damaged', 'poor service',
+        'not satisfied', 'unhappy', 'wrong', 'error'
+    ],
+    # User wants to look up a complaint
+    "query": [
+        'show details', 'check complaint', 'complaint status',
+        'my complaint', 'complaint id', 'check status'
+    ],
+    # Words that mean a short message is not someone's name
+    "not_name": ['complaint', 'issue', 'problem', 'delayed', 'damaged', '@', 'phone', 'number'],
+    # Words that make a message count as complaint details
+    "details": ['order', 'delivery', 'service', 'product', 'issue', 'problem'],
+}
+
+# Messages made only of these words are small talk; the first category found, in this order, names it
+SMALL_TALK_WORDS = {
+    "goodbye": {'bye', 'goodbye', 'farewell', 'cya', 'later'},
+    "thanks": {'thanks', 'thank', 'thx', 'ty', 'cheers', 'appreciate', 'appreciated'},
+    "greeting": {'hi', 'hello', 'hey', 'hiya', 'howdy', 'greetings', 'morning', 'afternoon', 'evening'},
+    "acknowledgement": {'ok', 'okay', 'k', 'cool', 'alright', 'sure', 'got', 'it', 'perfect', 'fine', 'understood', 'awesome', 'noted'},
+}
+# Words that may pad a templated reply ("thank you so much", "good morning there")
+SMALL_TALK_FILLER = {
+    'you', 'so', 'much', 'very', 'a', 'lot', 'all', 'for', 'your', 'the', 'help', 'and', 'too',
+    'oh', 'well', 'good', 'great', 'nice', 'see', 'have', 'day', 'there', 'again'
+}
+# Conversational words that still need an LLM reply, just not the knowledge base
+CHITCHAT_WORDS = {
+    'how', 'are', 'is', 'doing', "what's", 'whats', 'up', 'today', 'going', 'to', 'meet', 'who',
+    'am', 'i', 'talking', 'with', 'can', 'me', 'what', 'do', "how's", 'hows', 'things'
+}
+SMALL_TALK_MAX_WORDS = 8
+SMALL_TALK_TEXT = re.compile(r"[a-z' ,.!?-]+")
+WORD = re.compile(r"[a-z']+")
+
+
+def small_talk_kind(lowered: str):
+    """greeting/thanks/goodbye/acknowledgement, "chitchat" for other small talk, else None"""
+    if len(lowered) > 80 or not SMALL_TALK_TEXT.fullmatch(lowered):
+        return None
+    words = set(WORD.findall(lowered))
+    if not words or len(words) > SMALL_TALK_MAX_WORDS:
+        return None
+    kinds = [kind for kind, vocabulary in SMALL_TALK_WORDS.items() if words & vocabulary]
+    templated = set().union(*SMALL_TALK_WORDS.values()) | SMALL_TALK_FILLER
+    if kinds and words <= templated:
+        return kinds[0]
+    if words <= templated | CHITCHAT_WORDS:
+        return "chitchat"
+    return None
+
+
+def trie_pattern(words):
+    """Regex alternation shaped like a prefix trie, so matching never backtracks across keywords"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional tails are greedy, so the longest keyword starting at a position wins
+        return f"(?:{group})?" if "" in node else group
+
+    return build(trie)
+
+
+class Extraction:
+    """Everything the chat flow needs to know about one message"""
+
+    def __init__(self, complaint_id=None, email=None, phone_number=None, categories=frozenset(), small_talk=None):
+        self.complaint_id = complaint_id
+        self.email = email
+        self.phone_number = phone_number
+        self.categories = categories
+        self.small_talk = small_talk
+
+    @property
+    def is_filing_intent(self):
+        return "filing" in self.categories
+
+    @property
+    def is_query_intent(self):
+        return "query" in self.categories or self.complaint_id is not None
+
+    def contact_info(self):
+        info = {}
+        if self.email:
+            info['email'] = self.email
+        if self.phone_number:
+            info['phone_number'] = self.phone_number
+        return info
+
+
+class IntentExtractor:
+    """Finds intents, complaint IDs, emails and phone numbers in a single regex pass.
+
+    Entities are consumed as they are found, so digits inside a complaint ID are never
+    read as a phone number; keywords are matched with a zero-width lookahead so that
+    overlapping keywords are all seen, and emails are rescanned for the keywords they
+    consumed. A bare 10-digit number is searched for separately, as the international
+    alternative may already have consumed it ("+91 9876543210"). The pattern runs over the lowercased text
+    (IGNORECASE is several times slower), and alternatives that cannot match, such
+    as emails in a message without "@", are left out of the compiled variant used.
+    """
+
+    def __init__(self, keyword_groups=KEYWORD_GROUPS):
+        keywords = {word for words in keyword_groups.values() for word in words}
+        # A keyword also counts for every group that has a keyword contained in it
+        self.keyword_categories = {
+            keyword: frozenset(group for group, words in keyword_groups.items() if any(word in keyword for word in words))
+            for keyword in keywords
+        }
+        keyword_pattern = f"(?=(?P<keyword>{trie_pattern(keywords)}))"
+        self.keyword_pattern = re.compile(keyword_pattern)
+        self.patterns = {}
+        for has_at in (False, True):
+            for has_digit in (False, True):
+                alternatives = []
+                if has_digit:
+                    # Complaint IDs always contain a digit (the version nibble)
+                    alternatives.append(f"(?P<complaint_id>{COMPLAINT_ID_PATTERN})")
+                if has_at:
+                    alternatives.append(f"(?P<email>{EMAIL_PATTERN})")
+                if has_digit:
+                    alternatives.append(f"(?P<phone>{PHONE_PATTERN})")
+                alternatives.append(keyword_pattern)
+                self.patterns[has_at, has_digit] = re.compile("|".join(alternatives))
+        self.fallback_pattern = re.compile(self.patterns[True, True].pattern, re.IGNORECASE)
+
+    def extract(self, text: str):
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            pattern = self.patterns["@" in text, DIGIT.search(text) is not None]
+        else:
+            # Lowercasing changed offsets (e.g. "İ"), so match the original text instead
+            pattern, lowered = self.fallback_pattern, text
+
+        complaint_id = email = phone_number = None
+        categories = set()
+        for match in pattern.finditer(lowered):
+            kind = match.lastgroup
+            if kind == "keyword":
+                categories |= self.keyword_categories[match.group("keyword").lower()]
+            elif kind == "complaint_id":
+                complaint_id = complaint_id or text[match.start():match.end()]
+            elif kind == "email":
+                email = email or text[match.start():match.end()]
+                categories.add("not_name")
+                # Keywords starting inside the email ("problem.solver@x.com") were consumed with it
+                for keyword in self.keyword_pattern.finditer(lowered, match.start()):
+                    if keyword.start() >= match.end():
+                        break
+                    categories |= self.keyword_categories[keyword.group("keyword").lower()]
+            elif kind == "phone":
+                phone_number = phone_number or text[match.start():match.end()]
+        if phone_number is not None or email is not None:
+            ten_digits = TEN_DIGITS.search(text)
+            if ten_digits:
+                phone_number = ten_digits.group()
+        small_talk = small_talk_kind(lowered) if not categories and complaint_id is None else None
+        return Extraction(complaint_id, email, phone_number, frozenset(categories), small_talk)
+
+
+# Create global instance
+extractor = IntentExtractor()
@@ -1,34 +1,241 @@
-from fastapi import FastAPI, HTTPException
-from uuid import uuid4
+import json
+import time
+import asyncio
 from datetime import datetime
-from models import ComplaintCreate, ComplaintCreateResponse, ComplaintResponse
-from database import complaints_collection
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from models import (
+    ComplaintCreate, ComplaintCreateResponse, ComplaintResponse,
+    ComplaintBulkCreate, ComplaintBulkCreateResponse, ComplaintListResponse,
+    ComplaintLookupRequest, ComplaintLookupResponse, SimilarComplaintsResponse,
+    ChatRequest, ChatResponse
+)
+from chat_service import chat_service
+from rag_service import rag_service
+from tracing import tracer, TracingMiddleware
+from metrics import Counter, prometheus_histograms, prometheus_counter
+from complaint_similarity import complaint_index
+from embedding_cache import embedding_cache
+from complaint_cache import complaint_cache
+from settings import COMPLAINT_INDEXING
+import complaint_service
 
-app = FastAPI()
 
+async def warm_up():
+    """Build the OpenAI clients and load the indexes before the first chat turn needs them"""
+    start = time.perf_counter()
+    status = await rag_service.warm_up()
+    status["seconds"] = time.perf_counter() - start
+    print(f"warm-up done in {status['seconds']:.2f}s: {status}")
+    return status
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await complaint_service.ensure_indexes()
+    await chat_service.store.ensure_indexes()
+    # Warm up in the background: /health answers at once and /ready turns 200 when this is done
+    app.state.warm_up = asyncio.create_task(warm_up())
+    if COMPLAINT_INDEXING:
+        complaint_index.start()
+    yield
+    app.state.warm_up.cancel()
+    if complaint_service.batcher is not None:
+        await complaint_service.batcher.close()
+    await complaint_index.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TracingMiddleware, tracer=tracer, exclude=("/metrics", "/stats", "/health", "/ready"))
 
-@app.post("/complaints", response_model=ComplaintCreateResponse)
-async def create_complaint(complaint: ComplaintCreate):
-    complaint_id = str(uuid4())
-    complaint_doc = {
-        "complaint_id": complaint_id,
-        "name": complaint.name,
-        "phone_number": complaint.phone_number,
-        "email": complaint.email,
-        "complaint_details": complaint.complaint_details,
-        "created_at": datetime.utcnow()
-    }
 
-    await complaints_collection.insert_one(complaint_doc)
+@app.post("/complaints", response_model=ComplaintCreateResponse)
+async def create_complaint(complaint: ComplaintCreate, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Create a complaint; retries carrying the same Idempotency-Key get the original complaint ID back"""
+    try:
+        complaint_id = await complaint_service.create_complaint(complaint, idempotency_key)
+    except complaint_service.IdempotencyKeyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     return {"complaint_id": complaint_id, "message": "Complaint created successfully"}
 
 
+@app.post("/complaints/bulk", response_model=ComplaintBulkCreateResponse)
+async def create_complaints(bulk: ComplaintBulkCreate):
+    """Create up to 1000 complaints with a single unordered insert"""
+    complaint_ids, errors = await complaint_service.create_complaints(bulk.complaints)
+    return {"complaint_ids": complaint_ids, "errors": errors}
+
+
+@app.get("/complaints", response_model=ComplaintListResponse, response_model_exclude_unset=True)
+async def list_complaints(
+    email: Optional[str] = None,
+    phone_number: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of name, phone_number, email, complaint_details"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """List complaints newest first; pass next_cursor back as cursor to get the following page"""
+    selected = None
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected - complaint_service.LIST_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    try:
+        complaints, next_cursor = await complaint_service.list_complaints(
+            email, phone_number, created_from, created_to, selected, cursor, limit
+        )
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {"complaints": complaints, "next_cursor": next_cursor}
+
+
 @app.get("/complaints/{complaint_id}", response_model=ComplaintResponse)
-async def get_complaint(complaint_id: str): 
-    complaint = await complaints_collection.find_one({"complaint_id": complaint_id})
-    if not complaint:
+async def get_complaint(complaint_id: str, request: Request): 
+    entry = await complaint_service.get_complaint_entry(complaint_id)
+    if not entry:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
-    # Convert MongoDB document to Pydantic model
-    return ComplaintResponse(**complaint)
+    headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    # The cached body was already validated against ComplaintResponse
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+@app.get("/complaints/{complaint_id}/similar", response_model=SimilarComplaintsResponse)
+async def similar_complaints(complaint_id: str, limit: int = Query(5, ge=1, le=50), min_score: float = Query(0.0, ge=-1.0, le=1.0)):
+    """Open complaints most similar to this one, for spotting duplicates during triage"""
+    similar = await complaint_index.similar(complaint_id, limit, min_score)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    return {"complaint_id": complaint_id, "similar": similar}
+
+
+@app.post("/complaints/lookup", response_model=ComplaintLookupResponse)
+async def lookup_complaints(lookup: ComplaintLookupRequest):
+    """Fetch up to 100 complaints by ID in one round trip"""
+    complaints = await complaint_service.get_complaints(lookup.complaint_ids)
+    found = {complaint["complaint_id"] for complaint in complaints}
+    missing = [complaint_id for complaint_id in lookup.complaint_ids if complaint_id not in found]
+    return {"complaints": [ComplaintResponse(**complaint) for complaint in complaints], "missing": missing}
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(chat: ChatRequest):
+    """Run one chat turn for a session"""
+    response, complaint_context = await chat_service.chat(chat.session_id, chat.message, chat.language)
+    return {"session_id": chat.session_id, "response": response, "complaint_context": complaint_context}
+
+
+@app.post("/chat/stream")
+async def chat_stream(chat: ChatRequest):
+    """Run one chat turn for a session, streaming the answer as server-sent events, one event per token"""
+    state = await chat_service.load(chat.session_id)
+
+    async def events():
+        start = time.perf_counter()
+        time_to_first_token = None
+        async for token in chat_service.stream(chat.session_id, chat.message, state, chat.language):
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+            yield f"data: {json.dumps({'token': token})}\n\n"
+
+        done = {
+            "complaint_context": state['complaint_context'],
+            "time_to_first_token": time_to_first_token,
+            "total_time": time.perf_counter() - start
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.delete("/chat/{session_id}")
+async def reset_chat(session_id: str):
+    """Forget a session's history and complaint context"""
+    await chat_service.reset(session_id)
+    return {"session_id": session_id, "message": "Session cleared"}
+
+
+@app.get("/health")
+async def health():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until warm-up has finished; a failed warm-up is retried on the next probe"""
+    task = app.state.warm_up
+    if not task.done():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    if task.cancelled() or task.exception() is not None:
+        error = "cancelled" if task.cancelled() else str(task.exception())
+        app.state.warm_up = asyncio.create_task(warm_up())
+        return JSONResponse(status_code=503, content={"status": "not_ready", "error": error})
+    return {"status": "ready", **task.result()}
+
+
+def cache_stats():
+    return {
+        "response": rag_service.response_cache.stats(),
+        "embedding": embedding_cache.stats(),
+        "complaint": complaint_cache.stats(),
+    }
+
+
+@app.get("/stats")
+async def stats():
+    """Hit rates of the response, embedding and complaint caches, and the answer latency the response cache saved"""
+    return {"caches": cache_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition: span, route and retrieval stage latency histograms, token counts and cache lookups"""
+    lines = (
+        prometheus_histograms("support_bot_span_seconds", tracer.latency, "span", "Span duration in seconds")
+        + prometheus_histograms("support_bot_route_seconds", rag_service.route_latency, "route", "Chat answer duration per route in seconds")
+        + prometheus_histograms("support_bot_retrieval_stage_seconds", rag_service.latency, "stage", "Retrieval stage duration in seconds")
+        + prometheus_counter("support_bot_tokens_total", rag_service.tokens, "Tokens sent to and received from OpenAI models")
+    )
+    caches = cache_stats()
+    lookups = Counter(("cache", "result"))
+    lookups.inc("response", "hit", amount=caches["response"]["hits"])
+    lookups.inc("response", "miss", amount=caches["response"]["misses"])
+    lookups.inc("embedding", "memory_hit", amount=caches["embedding"]["memory_hits"])
+    lookups.inc("embedding", "disk_hit", amount=caches["embedding"]["disk_hits"])
+    lookups.inc("embedding", "miss", amount=caches["embedding"]["misses"])
+    lookups.inc("complaint", "hit", amount=caches["complaint"]["hits"])
+    lookups.inc("complaint", "negative_hit", amount=caches["complaint"]["negative_hits"])
+    lookups.inc("complaint", "miss", amount=caches["complaint"]["misses"])
+    saved = Counter()
+    saved.inc(amount=caches["response"]["latency_saved_seconds"])
+    lines += (
+        prometheus_counter("support_bot_cache_lookups_total", lookups, "Cache lookups per cache and result")
+        + prometheus_counter("support_bot_response_cache_saved_seconds_total", saved, "Answer latency saved by response cache hits in seconds")
+    )
+    lines += (
+        prometheus_histograms("support_bot_complaint_index_batch_size", complaint_index.batch_sizes, "kind", "Complaints embedded per indexing batch")
+        + prometheus_histograms("support_bot_complaint_index_seconds", complaint_index.latency, "stage", "Complaint indexing batch duration in seconds")
+    )
+    batcher = complaint_service.batcher
+    if batcher is not None:
+        lines += (
+            prometheus_histograms("support_bot_complaint_batch_size", batcher.batch_sizes, "kind", "Complaints per group-committed insert")
+            + prometheus_histograms("support_bot_complaint_write_seconds", batcher.latency, "stage", "Complaint batch commit and acknowledgement latency in seconds")
+        )
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -0,0 +1,134 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+# For counts rather than seconds, e.g. documents per batch
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, math.inf)
+
+
+class Histogram:
+    """Fixed-bucket histogram (latency in seconds by default) with estimated quantiles"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float):
+        """Estimate a quantile by interpolating inside the bucket that contains it"""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            cumulative = 0
+            lower = 0.0
+            for bound, count in zip(self.buckets, self.counts):
+                if count and cumulative + count >= rank:
+                    if math.isinf(bound):
+                        return lower
+                    return lower + (bound - lower) * (rank - cumulative) / count
+                cumulative += count
+                lower = bound
+            return lower
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class LatencyStats:
+    """Named latency histograms, e.g. one per endpoint"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name: str):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(self.buckets)
+            return self.histograms[name]
+
+    def observe(self, name: str, seconds: float):
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        return {name: histogram.snapshot() for name, histogram in sorted(self.histograms.items())}
+
+
+class Counter:
+    """Monotonic counters keyed by a tuple of label values"""
+
+    def __init__(self, labels=()):
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def format_labels(labels: dict):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def prometheus_histograms(metric: str, stats: LatencyStats, label: str, help_text: str):
+    """Prometheus text lines for every histogram in stats, plus p50/p95/p99 as a gauge"""
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    quantiles = [f"# HELP {metric}_quantile Estimated {help_text.lower()} quantiles", f"# TYPE {metric}_quantile gauge"]
+    with stats.lock:
+        histograms = sorted(stats.histograms.items())
+    for name, histogram in histograms:
+        with histogram.lock:
+            counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+        cumulative = 0
+        for bound, bucket_count in zip(histogram.buckets, counts):
+            cumulative += bucket_count
+            le = "+Inf" if math.isinf(bound) else repr(bound)
+            lines.append(f"{metric}_bucket{format_labels({label: name, 'le': le})} {cumulative}")
+        lines.append(f"{metric}_sum{format_labels({label: name})} {total}")
+        lines.append(f"{metric}_count{format_labels({label: name})} {count}")
+        for q in (0.5, 0.95, 0.99):
+            quantiles.append(f"{metric}_quantile{format_labels({label: name, 'quantile': q})} {histogram.quantile(q)}")
+    return lines + quantiles
+
+
+def prometheus_counter(metric: str, counter: Counter, help_text: str):
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+    for label_values, value in sorted(counter.snapshot().items()):
+        lines.append(f"{metric}{format_labels(dict(zip(counter.labels, label_values)))} {value}")
+    return lines
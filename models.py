@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Annotated
+from typing import Annotated, Optional
 from datetime import datetime
 
 PhoneNumber = Annotated[str, Field(pattern=r'^\+?[0-9]{10,15}$')]
@@ -21,3 +21,54 @@ class ComplaintResponse(BaseModel):
 class ComplaintCreateResponse(BaseModel):
     complaint_id: str
     message: str
+
+class ComplaintBulkCreate(BaseModel):
+    complaints: list[ComplaintCreate] = Field(max_length=1000)
+
+class ComplaintBulkError(BaseModel):
+    index: int
+    error: str
+
+class ComplaintBulkCreateResponse(BaseModel):
+    complaint_ids: list[str]
+    errors: list[ComplaintBulkError]
+
+class ComplaintListItem(BaseModel):
+    complaint_id: str
+    created_at: datetime
+    name: Optional[str] = None
+    phone_number: Optional[str] = None
+    email: Optional[str] = None
+    complaint_details: Optional[str] = None
+
+class ComplaintListResponse(BaseModel):
+    complaints: list[ComplaintListItem]
+    next_cursor: Optional[str] = None
+
+class ComplaintLookupRequest(BaseModel):
+    complaint_ids: list[str] = Field(max_length=100)
+
+class ComplaintLookupResponse(BaseModel):
+    complaints: list[ComplaintResponse]
+    missing: list[str]
+
+class SimilarComplaint(BaseModel):
+    complaint_id: str
+    score: float
+    complaint_details: str
+    created_at: datetime
+
+class SimilarComplaintsResponse(BaseModel):
+    complaint_id: str
+    similar: list[SimilarComplaint]
+
+class ChatRequest(BaseModel):
+    session_id: str
+    message: str
+    # Knowledge base language for the session, e.g. "de"; kept until a request sets another
+    language: Optional[str] = None
+
+class ChatResponse(BaseModel):
+    session_id: str
+    response: str
+    complaint_context: dict
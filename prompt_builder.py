@@ -0,0 +1,164 @@
+from settings import *
+
+# Static instructions come first and never change, so the provider's prompt cache can reuse them
+SYSTEM_PROMPT = """You are a helpful customer service chatbot for Cyfuture. Your role is to:
+1. Help customers file complaints by collecting their details (name, phone, email, complaint details)
+2. Provide information based on the knowledge base
+3. Be empathetic and professional
+4. Ask follow-up questions to collect missing information
+
+Guidelines:
+- If the user wants to file a complaint, collect all required information step by step
+- Be conversational and natural
+- If asked about complaint details with an ID, indicate that you'll help retrieve the information
+- Keep responses concise but helpful
+- Answer from the knowledge base context given with the latest message when it is relevant
+"""
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+# Shortest shared run of text treated as splitter overlap between two chunks
+MIN_CHUNK_OVERLAP = 50
+
+
+def chunk_overlap(first: str, second: str):
+    """Length of the longest suffix of first that is also a prefix of second"""
+    for size in range(min(len(first), len(second)), MIN_CHUNK_OVERLAP - 1, -1):
+        if second.startswith(first[-size:]):
+            return size
+    return 0
+
+
+def dedupe_chunks(chunks):
+    """Drop repeated chunks and strip the text neighbouring chunks share through splitter overlap"""
+    kept = []
+    for chunk in chunks:
+        chunk = chunk.strip()
+        if not chunk or any(chunk in other for other in kept):
+            continue
+        for other in kept:
+            chunk = chunk[chunk_overlap(other, chunk):]
+            overlap = chunk_overlap(chunk, other)
+            if overlap:
+                chunk = chunk[:-overlap]
+        chunk = chunk.strip()
+        if chunk:
+            kept.append(chunk)
+    return kept
+
+
+class PromptBuilder:
+    """Assembles chat prompts under a token budget.
+
+    Priority order: static instructions, the user's message and complaint context,
+    then retrieved knowledge (up to KNOWLEDGE_TOKEN_BUDGET), then as much recent
+    history as still fits.
+    """
+
+    def __init__(self, model=CHAT_MODEL, budget=PROMPT_TOKEN_BUDGET, knowledge_budget=KNOWLEDGE_TOKEN_BUDGET, history_messages=PROMPT_HISTORY_MESSAGES):
+        self.model = model
+        self.budget = budget
+        self.knowledge_budget = knowledge_budget
+        self.history_messages = history_messages
+        self._encoding = None
+        self.static_tokens = None
+
+    @property
+    def encoding(self):
+        """tiktoken encoding for the model, or False when it cannot be loaded (e.g. offline)"""
+        if self._encoding is None:
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"tiktoken encoding unavailable ({e}), estimating prompt tokens from length")
+                self._encoding = False
+        return self._encoding
+
+    def count(self, text: str):
+        if self.encoding:
+            return len(self.encoding.encode(text))
+        return (len(text) + 3) // 4
+
+    def truncate(self, text: str, tokens: int):
+        if tokens <= 0:
+            return ""
+        if self.encoding:
+            encoded = self.encoding.encode(text)
+            return text if len(encoded) <= tokens else self.encoding.decode(encoded[:tokens])
+        return text[:tokens * 4]
+
+    def context_message(self, knowledge: list, context: dict):
+        knowledge_context = "\n---\n".join(knowledge) if knowledge else "No specific knowledge base information found."
+        return f"""Knowledge Base Context:
+{knowledge_context}
+
+Current conversation context:
+- Name: {context.get('name') or 'Not provided'}
+- Phone: {context.get('phone_number') or 'Not provided'}
+- Email: {context.get('email') or 'Not provided'}
+- Complaint details: {context.get('complaint_details') or 'Not provided'}
+"""
+
+    def build(self, user_message: str, context: dict, relevant_docs: list, conversation_history: list):
+        """Returns (messages, usage) where usage breaks down the prompt tokens"""
+        # Imported here so that importing the service does not load langchain
+        from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+        if self.static_tokens is None:
+            self.static_tokens = self.count(SYSTEM_PROMPT) + MESSAGE_OVERHEAD
+        user_tokens = self.count(user_message) + MESSAGE_OVERHEAD
+        context_tokens = self.count(self.context_message([], context)) + MESSAGE_OVERHEAD
+        remaining = self.budget - self.static_tokens - user_tokens - context_tokens
+
+        # Knowledge: best-ranked chunks first, the last one cut to fit
+        knowledge = []
+        knowledge_tokens = 0
+        knowledge_budget = min(self.knowledge_budget, remaining)
+        for chunk in dedupe_chunks(relevant_docs):
+            tokens = self.count(chunk)
+            if knowledge_tokens + tokens > knowledge_budget:
+                chunk = self.truncate(chunk, knowledge_budget - knowledge_tokens)
+                if chunk:
+                    knowledge.append(chunk)
+                    knowledge_tokens = knowledge_budget
+                break
+            knowledge.append(chunk)
+            knowledge_tokens += tokens
+        remaining -= knowledge_tokens
+
+        # The session history already ends with the message being answered
+        if conversation_history and conversation_history[-1] == {"role": "user", "content": user_message}:
+            conversation_history = conversation_history[:-1]
+
+        # History: newest first until the budget runs out, older turns are dropped
+        history = []
+        history_tokens = 0
+        for message in reversed(conversation_history[-self.history_messages:]):
+            tokens = self.count(message['content']) + MESSAGE_OVERHEAD
+            if history_tokens + tokens > remaining:
+                break
+            history.append(message)
+            history_tokens += tokens
+        history.reverse()
+
+        messages = [SystemMessage(content=SYSTEM_PROMPT)]
+        for message in history:
+            message_class = AIMessage if message['role'] == "assistant" else HumanMessage
+            messages.append(message_class(content=message['content']))
+        # Per-turn context goes after the cacheable prefix (instructions + earlier turns)
+        context_message = self.context_message(knowledge, context)
+        messages.append(SystemMessage(content=context_message))
+        messages.append(HumanMessage(content=user_message))
+
+        usage = {
+            "static": self.static_tokens,
+            "knowledge": knowledge_tokens,
+            "history": history_tokens,
+            "history_dropped": len(conversation_history) - len(history),
+            "total": self.static_tokens + user_tokens + history_tokens + self.count(context_message) + MESSAGE_OVERHEAD,
+        }
+        return messages, usage
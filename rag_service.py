@@ -1,159 +1,435 @@
-import openai
-import re
+import time
+import queue
+import asyncio
+import logging
+import threading
+import httpx
 from settings import *
-from qdrant_client import QdrantClient
-from openai import OpenAI
 # from fastembed import TextEmbedding
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+from embedding_cache import embedding_cache, embedding_params, cache_model
+from response_cache import SemanticResponseCache
+from vector_store import create_vector_store
+from bm25_index import BM25Index
+from retrieval import reciprocal_rank_fusion, check_retrieval_mode, Reranker, KnowledgeFilters
+from metrics import LatencyStats, Counter
+from tracing import tracer
+from extraction import extractor
+from prompt_builder import PromptBuilder
+from router import TEMPLATES, choose_route, avoided_calls
+
+logger = logging.getLogger(__name__)
+
 
-client = OpenAI(
-    api_key=OPENAI_API_KEY
-)
 class RAGService:
+    """Async RAG pipeline; the sync methods are thin wrappers over the async ones.
+
+    All upstream I/O runs on one event loop owned by the service, so the pooled
+    HTTP connections are shared by every caller whatever thread or loop it is on.
+    Clients are built on first use (or by warm_up), so importing this module does
+    no network work and does not load the OpenAI or langchain packages.
+    """
+
     def __init__(self):
-        self.client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_KEY)
-        self.llm = ChatOpenAI(
+        # The loop thread starts on the first call that needs it, not at import
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = None
+        self.loop_lock = threading.Lock()
+
+        self._http_client = None
+        self._openai = None
+        self._llm = None
+        self._fast_llm = None
+        # A mistyped RETRIEVAL_MODE fails at startup instead of on every query
+        check_retrieval_mode(RETRIEVAL_MODE)
+        self.vector_store = create_vector_store()
+        self.sparse_index = BM25Index()
+        self.reranker = Reranker()
+        self.knowledge_filters = KnowledgeFilters()
+        # Caps upstream requests in flight no matter how many users are chatting
+        self.limiter = asyncio.Semaphore(RAG_MAX_CONCURRENCY)
+        self.response_cache = SemanticResponseCache()
+        self.prompt_builder = PromptBuilder(CHAT_MODEL)
+        # Per-stage retrieval latency: embed, dense, sparse, fusion, rerank
+        self.latency = LatencyStats()
+        # Count and end-to-end latency per route: template, chitchat, cache, rag
+        self.route_latency = LatencyStats()
+        self.tokens = Counter(("model", "kind"))
+
+    @property
+    def http_client(self):
+        """One pooled HTTP client shared by the embedding and chat calls"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=RAG_POOL_SIZE, max_keepalive_connections=RAG_POOL_SIZE),
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=5.0)
+            )
+        return self._http_client
+
+    @property
+    def openai(self):
+        if self._openai is None:
+            from openai import AsyncOpenAI
+            self._openai = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                http_client=self.http_client
+            )
+        return self._openai
+
+    def _chat_model(self, model: str, **kwargs):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
             api_key=OPENAI_API_KEY,
-            model="gpt-3.5-turbo",
-            temperature=0.7
+            base_url=OPENAI_BASE_URL,
+            model=model,
+            temperature=0.7,
+            timeout=LLM_TIMEOUT,
+            http_async_client=self.http_client,
+            **kwargs
         )
-        
-    def search_knowledge_base(self, query: str, limit: int = 3):
-        """Search the knowledge base for relevant information"""
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = self._chat_model(CHAT_MODEL)
+        return self._llm
+
+    @property
+    def fast_llm(self):
+        """Cheaper model for small talk, which gets short answers and no retrieval"""
+        if self._fast_llm is None:
+            self._fast_llm = self._chat_model(FAST_CHAT_MODEL, max_tokens=FAST_MAX_TOKENS)
+        return self._fast_llm
+
+    async def _warm_up(self):
+        """Build the clients and load the indexes; raises if the vector store is unreachable or built for other settings"""
+        # Building the clients imports openai and langchain, the slowest part of a cold start
+        self.openai
+        self.llm
+        self.fast_llm
+        self.prompt_builder.encoding
+        self.sparse_index.load()
+        # A collection built for other embedding settings would reject every query vector
+        await asyncio.to_thread(self.vector_store.check_config)
+        return {
+            "vector_points": await asyncio.to_thread(self.vector_store.count),
+            "sparse_documents": len(self.sparse_index.documents),
+        }
+
+    async def warm_up(self):
+        """Do the first-use work up front, e.g. from the app's startup, so the first chat turn does not pay it"""
+        return await self._on_loop(self._warm_up())
+
+    def _submit(self, coro):
+        """Schedule a coroutine on the service loop, starting its thread on first use"""
+        if self.loop_thread is None:
+            with self.loop_lock:
+                if self.loop_thread is None:
+                    self.loop_thread = threading.Thread(target=self.loop.run_forever, name="rag-service-loop", daemon=True)
+                    self.loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(tracer.bind(coro), self.loop)
+
+    async def _on_loop(self, coro):
+        """Await a coroutine on the service loop from any other loop"""
         try:
-            # Create embedding for the query
-            response = client.embeddings.create(
-                input=query,
-                model="text-embedding-3-small"
-            )
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(self._submit(coro))
+
+    def run(self, coro):
+        """Run a coroutine on the service loop and block for its result"""
+        return self._submit(coro).result()
+
+    def iterate(self, agen):
+        """Consume an async generator on the service loop as a regular generator"""
+        tokens = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    tokens.put(item)
+            finally:
+                tokens.put(done)
+
+        future = self._submit(pump())
+        try:
+            while (item := tokens.get()) is not done:
+                yield item
+            future.result()
+        finally:
+            # A consumer that stops early closes this generator; stop the pump with it
+            future.cancel()
+
+    async def _embed_query(self, query: str):
+        vectors = embedding_cache.get(cache_model(), query)
+        if vectors is None:
+            with tracer.span("openai.embeddings", model=EMBEDDING_MODEL):
+                async with self.limiter:
+                    response = await self.openai.embeddings.create(
+                        input=query,
+                        model=EMBEDDING_MODEL,
+                        timeout=EMBEDDING_TIMEOUT,
+                        **embedding_params()
+                    )
             vectors = response.data[0].embedding
-            
-            
-            # Search in Qdrant
-            search_result = self.client.search(
-                collection_name="customer_complaints_collection",
-                query_vector=vectors,
-                limit=limit
-            )
-            
-            # Extract relevant text
-            relevant_texts = []
-            for result in search_result:
-                relevant_texts.append(result.payload["text"])
-            
-            return relevant_texts
+            embedding_cache.put(cache_model(), query, vectors)
+            self.tokens.inc(EMBEDDING_MODEL, "embedding", amount=response.usage.total_tokens if response.usage else 0)
+        return vectors
+
+    async def _embed_texts(self, texts: list):
+        vectors = embedding_cache.get_many(cache_model(), texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            with tracer.span("openai.embeddings", model=EMBEDDING_MODEL, inputs=len(missing)):
+                async with self.limiter:
+                    response = await self.openai.embeddings.create(
+                        input=[texts[i] for i in missing],
+                        model=EMBEDDING_MODEL,
+                        timeout=EMBEDDING_TIMEOUT,
+                        **embedding_params()
+                    )
+            created = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            embedding_cache.put_many(cache_model(), [texts[i] for i in missing], created)
+            for i, vector in zip(missing, created):
+                vectors[i] = vector
+            self.tokens.inc(EMBEDDING_MODEL, "embedding", amount=response.usage.total_tokens if response.usage else 0)
+        return vectors
+
+    async def aembed_texts(self, texts: list):
+        """Embed many texts in one request, reusing cached vectors"""
+        return await self._on_loop(self._embed_texts(texts))
+
+    async def aembed_query(self, query: str):
+        """Create embedding for the query, reusing a cached one if we have it"""
+        return await self._on_loop(self._embed_query(query))
+
+    def embed_query(self, query: str):
+        return self.run(self._embed_query(query))
+        
+    async def _dense_search(self, query: str, limit: int, query_vector=None, filters=None):
+        try:
+            if query_vector is None:
+                with self.latency.timer("embed"):
+                    query_vector = await self._embed_query(query)
+
+            # Search the vector store (Qdrant or the in-process index)
+            with self.latency.timer("dense"):
+                async with self.limiter:
+                    return await self.vector_store.asearch(query_vector, limit, filters)
         except Exception as e:
             print(f"Error searching knowledge base: {e}")
             return []
+
+    def _sparse_search(self, query: str, limit: int, filters=None):
+        try:
+            with self.latency.timer("sparse"):
+                return self.sparse_index.search(query, limit, filters)
+        except Exception as e:
+            print(f"Error searching BM25 index: {e}")
+            return []
+
+    async def _retrieve(self, query: str, limit: int = RETRIEVAL_LIMIT, query_vector=None, mode: str = RETRIEVAL_MODE, filters=None):
+        """Dense and/or BM25 candidates, fused with reciprocal rank fusion and optionally reranked"""
+        check_retrieval_mode(mode)
+        # Fusion and reranking need a deeper candidate list than the final limit
+        candidates = max(limit, RETRIEVAL_CANDIDATES) if mode == "hybrid" or self.reranker.enabled else limit
+
+        # Both retrievers run at once; BM25 (and its reload after ingestion) runs off the loop
+        searches = []
+        if mode in ("hybrid", "dense"):
+            searches.append(self._dense_search(query, candidates, query_vector, filters))
+        if mode in ("hybrid", "sparse"):
+            searches.append(asyncio.to_thread(self._sparse_search, query, candidates, filters))
+        result_lists = await asyncio.gather(*searches)
+
+        with self.latency.timer("fusion"):
+            hits = reciprocal_rank_fusion(result_lists) if len(result_lists) > 1 else result_lists[0]
+
+        if self.reranker.enabled and hits:
+            with self.latency.timer("rerank"):
+                hits = await asyncio.to_thread(self.reranker.rerank, query, hits[:candidates], limit)
+        return hits[:limit]
+
+    async def _search_knowledge_base(self, query: str, limit: int = RETRIEVAL_LIMIT, query_vector=None, mode: str = RETRIEVAL_MODE, filters=None):
+        with tracer.span("rag.search_knowledge_base", mode=mode, limit=limit) as span:
+            if filters:
+                span.set(filters=";".join(f"{field}={value}" for field, value in sorted(filters.items())))
+            hits = await self._retrieve(query, limit, query_vector, mode, filters)
+            if not hits and filters:
+                # Better an answer from the whole knowledge base than one with no context
+                hits = await self._retrieve(query, limit, query_vector, mode)
+                span.set(filters_relaxed=True)
+            span.set(hits=len(hits))
+        return [hit["payload"]["text"] for hit in hits]
+
+    async def asearch_knowledge_base(self, query: str, limit: int = RETRIEVAL_LIMIT, query_vector=None, mode: str = RETRIEVAL_MODE, filters=None):
+        """Search the knowledge base for relevant information.
+
+        filters maps payload fields (source, product, version, language) to a value or
+        list of values; chunks that do not set a field match any value of it.
+        """
+        return await self._on_loop(self._search_knowledge_base(query, limit, query_vector, mode, filters))
+
+    def search_knowledge_base(self, query: str, limit: int = RETRIEVAL_LIMIT, query_vector=None, mode: str = RETRIEVAL_MODE, filters=None):
+        return self.run(self._search_knowledge_base(query, limit, query_vector, mode, filters))
+
+    def conversation_filters(self, user_message: str, context: dict, conversation_history: list):
+        """Knowledge base filters for a turn: products and versions the user named, and the session language"""
+        if not KNOWLEDGE_FILTERS:
+            return {}
+        try:
+            self.knowledge_filters.update(self.sparse_index.field_values(self.knowledge_filters.fields))
+        except Exception as e:
+            print(f"Error loading knowledge base metadata: {e}")
+            return {}
+        earlier = [message["content"] for message in conversation_history if message.get("role") == "user"]
+        messages = [user_message] + earlier[::-1][:KNOWLEDGE_FILTER_MESSAGES - 1]
+        return self.knowledge_filters.extract(messages, context)
+
+    def retrieval_stats(self):
+        """p50/p95/p99 latency per retrieval stage"""
+        return self.latency.snapshot()
     
+    def extract(self, text: str):
+        """Intents and entities of a message in one pass; prefer this over the single-purpose helpers"""
+        return extractor.extract(text)
+
     def extract_complaint_id(self, text: str):
         """Extract complaint ID from user query"""
-
-        patterns =r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[1-5][0-9a-fA-F]{3}-[89abAB][0-9a-fA-F]{3}-[0-9a-fA-F]{12}\b'
-        matches = re.findall(patterns, text)
-        print(matches)
-        if matches:
-            return matches[0]
-        return None
+        return extractor.extract(text).complaint_id
     
     def extract_contact_info(self, text: str):
         """Extract contact information from user input"""
-        info = {}
-        
-        # Extract email
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_match = re.search(email_pattern, text)
-        if email_match:
-            info['email'] = email_match.group()
-        
-        # Extract phone number
-        phone_patterns = [
-            r'\b\d{10}\b',  # 10 digits
-            r'\b\+?\d{1,3}[-.\s]?\d{3,4}[-.\s]?\d{3,4}[-.\s]?\d{3,4}\b',  # International format
-        ]
-        for pattern in phone_patterns:
-            phone_match = re.search(pattern, text)
-            if phone_match:
-                info['phone_number'] = phone_match.group()
-                break
-        
-        return info
+        return extractor.extract(text).contact_info()
     
-    def generate_response(self, user_message: str, context: dict, conversation_history: list):
+    async def agenerate_response(self, user_message: str, context: dict, conversation_history: list):
         """Generate chatbot response using RAG"""
-        # Search knowledge base for relevant information
-        relevant_docs = self.search_knowledge_base(user_message)
-        
-        # Prepare context for the prompt
-        knowledge_context = "\n".join(relevant_docs) if relevant_docs else "No specific knowledge base information found."
-        
-        # Create system prompt
-        system_prompt = f"""You are a helpful customer service chatbot for Cyfuture. Your role is to:
-1. Help customers file complaints by collecting their details (name, phone, email, complaint details)
-2. Provide information based on the knowledge base
-3. Be empathetic and professional
-4. Ask follow-up questions to collect missing information
-
-Knowledge Base Context:
-{knowledge_context}
-
-Current conversation context:
-- Name: {context.get('name', 'Not provided')}
-- Phone: {context.get('phone_number', 'Not provided')}
-- Email: {context.get('email', 'Not provided')}
-- Complaint details: {context.get('complaint_details', 'Not provided')}
-
-Guidelines:
-- If the user wants to file a complaint, collect all required information step by step
-- Be conversational and natural
-- If asked about complaint details with an ID, indicate that you'll help retrieve the information
-- Keep responses concise but helpful
-"""
-
-        # Create the prompt
-        messages = [
-            SystemMessage(content=system_prompt),
-        ]
-        
-        # Add conversation history
-        for msg in conversation_history[-5:]:  # Keep last 5 messages for context
-            messages.append(HumanMessage(content=f"{msg['role']}: {msg['content']}"))
-        
-        # Add current message
-        messages.append(HumanMessage(content=f"User: {user_message}"))
-        
+        return "".join([token async for token in self.agenerate_response_stream(user_message, context, conversation_history)])
+
+    def generate_response(self, user_message: str, context: dict, conversation_history: list):
+        return "".join(self.generate_response_stream(user_message, context, conversation_history))
+
+    async def agenerate_response_stream(self, user_message: str, context: dict, conversation_history: list):
+        """Generate chatbot response using RAG, yielding tokens as the LLM produces them"""
+        agen = self._generate_response_stream(user_message, context, conversation_history)
         try:
-            response = self.llm.invoke(messages)
-            return response.content
-        except Exception as e:
-            return f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {str(e)}"
+            while True:
+                try:
+                    yield await self._on_loop(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            await self._on_loop(agen.aclose())
+
+    async def _stream_llm(self, llm, model: str, messages: list, outcome: dict):
+        """Stream one LLM answer; outcome gets the answer text and whether the call failed"""
+        tokens = []
+        with tracer.span("llm.stream", activate=False, model=model) as span:
+            try:
+                async with self.limiter:
+                    async for chunk in llm.astream(messages):
+                        if chunk.content:
+                            if not tokens:
+                                span.set(time_to_first_token=time.perf_counter() - span.start)
+                            tokens.append(chunk.content)
+                            yield chunk.content
+            except Exception as e:
+                span.set(error=type(e).__name__)
+                outcome["failed"] = True
+                yield f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {str(e)}"
+                return
+            outcome["answer"] = "".join(tokens)
+            completion_tokens = self.prompt_builder.count(outcome["answer"])
+            span.set(completion_tokens=completion_tokens)
+            self.tokens.inc(model, "completion", amount=completion_tokens)
+
+    async def _generate_response_stream(self, user_message: str, context: dict, conversation_history: list):
+        start = time.perf_counter()
+        extraction = extractor.extract(user_message)
+        route = choose_route(user_message, extraction)
+        outcome = {"failed": False}
+        # Not activated: the span stays open across yields
+        with tracer.span("rag.generate_response", activate=False) as span:
+            try:
+                if route == "template":
+                    yield TEMPLATES[extraction.small_talk]
+                    return
+
+                if route == "chitchat":
+                    messages, usage = self.prompt_builder.build(user_message, context, [], conversation_history)
+                    self.log_prompt(route, FAST_CHAT_MODEL, usage)
+                    span.set(prompt_tokens=usage['total'])
+                    async for token in self._stream_llm(self.fast_llm, FAST_CHAT_MODEL, messages, outcome):
+                        yield token
+                    return
+
+                try:
+                    with self.latency.timer("embed"):
+                        query_vector = await self._embed_query(user_message)
+                except Exception as e:
+                    print(f"Error embedding query: {e}")
+                    query_vector = None
+
+                filters = self.conversation_filters(user_message, context, conversation_history)
+                # Answers only depend on the question while no complaint is being collected
+                # and the conversation has not narrowed the knowledge base
+                cacheable = query_vector is not None and not filters and not any(
+                    context.get(field) for field in ('name', 'phone_number', 'email', 'complaint_details')
+                )
+                if cacheable:
+                    cached_answer = self.response_cache.lookup(query_vector)
+                    if cached_answer is not None:
+                        route = "cache"
+                        yield cached_answer
+                        return
+
+                # Search knowledge base for relevant information
+                relevant_docs = await self._search_knowledge_base(user_message, query_vector=query_vector, filters=filters)
+
+                # Budgeted prompt: static instructions, recent history, then this turn's context
+                messages, usage = self.prompt_builder.build(user_message, context, relevant_docs, conversation_history)
+                self.log_prompt(route, CHAT_MODEL, usage)
+                span.set(prompt_tokens=usage['total'])
+
+                async for token in self._stream_llm(self.llm, CHAT_MODEL, messages, outcome):
+                    yield token
+
+                if cacheable and not outcome["failed"]:
+                    self.response_cache.store(query_vector, outcome["answer"], time.perf_counter() - start)
+            finally:
+                span.set(route=route)
+                self.route_latency.observe(route, time.perf_counter() - start)
+
+    def log_prompt(self, route: str, model: str, usage: dict):
+        self.tokens.inc(model, "prompt", amount=usage['total'])
+        logger.debug(
+            "%s prompt tokens: %d (static %d, knowledge %d, history %d, %d older messages dropped)",
+            route, usage['total'], usage['static'], usage['knowledge'], usage['history'], usage['history_dropped']
+        )
+
+    def route_stats(self):
+        """Requests and p50/p95/p99 latency per route, and the upstream calls the cheap routes avoided"""
+        routes = self.route_latency.snapshot()
+        return {
+            "routes": routes,
+            "avoided_calls": avoided_calls({route: stats["count"] for route, stats in routes.items()}),
+        }
+
+    def generate_response_stream(self, user_message: str, context: dict, conversation_history: list):
+        """Generate chatbot response using RAG, yielding tokens as the LLM produces them"""
+        return self.iterate(self._generate_response_stream(user_message, context, conversation_history))
     
     def is_complaint_filing_intent(self, text: str):
         """Check if user wants to file a complaint"""
-        complaint_keywords = [
-            'complaint', 'complain', 'issue', 'problem', 'file a complaint',
-            'report a problem', 'delayed', 'damaged', 'poor service',
-            'not satisfied', 'unhappy', 'wrong', 'error'
-        ]
-        
-        text_lower = text.lower()
-        return any(keyword in text_lower for keyword in complaint_keywords)
+        return extractor.extract(text).is_filing_intent
     
     def is_complaint_query_intent(self, text: str):
         """Check if user wants to query complaint details"""
-        query_keywords = [
-            'show details', 'check complaint', 'complaint status',
-            'my complaint', 'complaint id', 'check status'
-        ]
-        
-        text_lower = text.lower()
-        has_query_intent = any(keyword in text_lower for keyword in query_keywords)
-        print(has_query_intent)
-        has_complaint_id = self.extract_complaint_id(text) is not None
-        print(has_complaint_id)
-        return has_query_intent or has_complaint_id
+        return extractor.extract(text).is_query_intent
 
 # Create global instance
 rag_service = RAGService()
@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+import numpy as np
+from settings import *
+
+
+class SemanticResponseCache:
+    """Reuses answers for questions whose embedding is close to one already answered"""
+
+    def __init__(self, threshold=RESPONSE_CACHE_THRESHOLD, ttl=RESPONSE_CACHE_TTL, max_size=RESPONSE_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = []
+        self.matrix = None
+        self.index_version = self.current_index_version()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    def current_index_version(self):
+        """The manifest is rewritten whenever data_store.py changes the collection"""
+        try:
+            return os.stat(INDEX_MANIFEST_PATH).st_mtime_ns
+        except OSError:
+            return None
+
+    def invalidate(self):
+        """Drop every cached answer, e.g. after the collection is re-indexed"""
+        with self.lock:
+            self.entries = []
+            self.matrix = None
+            self.invalidations += 1
+
+    def _check_index_version(self):
+        version = self.current_index_version()
+        if version != self.index_version:
+            self.index_version = version
+            self.invalidate()
+
+    def _normalize(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_expired(self, now):
+        live = [entry for entry in self.entries if now - entry["created_at"] < self.ttl]
+        if len(live) != len(self.entries):
+            self.entries = live
+            self.matrix = None
+
+    def lookup(self, query_vector):
+        """Return a cached answer if a previous question is similar enough, else None"""
+        self._check_index_version()
+        start = time.perf_counter()
+        now = time.time()
+        with self.lock:
+            self._drop_expired(now)
+            if not self.entries:
+                self.misses += 1
+                return None
+
+            if self.matrix is None:
+                self.matrix = np.vstack([entry["vector"] for entry in self.entries])
+            scores = self.matrix @ self._normalize(query_vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self.entries[best]
+            entry["last_used"] = now
+            self.hits += 1
+            self.latency_saved += max(entry["cost"] - (time.perf_counter() - start), 0.0)
+            return entry["answer"]
+
+    def store(self, query_vector, answer: str, cost: float):
+        """Cache an answer together with the seconds it took to produce"""
+        now = time.time()
+        with self.lock:
+            self._drop_expired(now)
+            if len(self.entries) >= self.max_size:
+                oldest = min(range(len(self.entries)), key=lambda i: self.entries[i]["last_used"])
+                self.entries.pop(oldest)
+            self.entries.append({
+                "vector": self._normalize(query_vector),
+                "answer": answer,
+                "cost": cost,
+                "created_at": now,
+                "last_used": now,
+            })
+            self.matrix = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "invalidations": self.invalidations,
+            "latency_saved_seconds": self.latency_saved,
+        }
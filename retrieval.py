@@ -0,0 +1,119 @@
+import re
+from settings import *
+
+# Knowledge base payload fields that get a payload index and can be filtered on
+METADATA_FIELDS = ("source", "product", "version", "language")
+# A version only counts when introduced like this, so "2 weeks" is not version 2
+VERSION_PREFIX = r"(?:\bv\.?\s?|\bversion\s+|\brelease\s+)"
+RETRIEVAL_MODES = ("hybrid", "dense", "sparse")
+
+
+def check_retrieval_mode(mode: str):
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown RETRIEVAL_MODE {mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+    return mode
+
+
+def filter_values(value):
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def payload_matches(payload: dict, filters: dict):
+    """True when each filtered field holds one of the wanted values or is not set.
+
+    Untagged chunks (e.g. a general policy with no product) apply to every product,
+    so they stay searchable whatever the filters are.
+    """
+    for field, wanted in filters.items():
+        value = payload.get(field)
+        if value is not None and value not in filter_values(wanted):
+            return False
+    return True
+
+
+def reciprocal_rank_fusion(result_lists, k=RRF_K):
+    """Merge ranked hit lists by summing 1 / (k + rank); robust to the lists' incomparable scores"""
+    scores = {}
+    hits = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1.0 / (k + rank)
+            hits.setdefault(hit["id"], hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [{**hits[point_id], "score": scores[point_id]} for point_id in ranked]
+
+
+class Reranker:
+    """Optional local cross-encoder that re-scores fused candidates.
+
+    Enabled by setting RERANKER_MODEL (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2);
+    needs sentence-transformers. The model is loaded on first use.
+    """
+
+    def __init__(self, model_name=RERANKER_MODEL):
+        self.model_name = model_name
+        self.model = None
+        self.enabled = bool(model_name)
+
+    def _load(self):
+        if self.model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                print("RERANKER_MODEL is set but sentence-transformers is not installed, reranking disabled")
+                self.enabled = False
+                return None
+            self.model = CrossEncoder(self.model_name)
+        return self.model
+
+    def rerank(self, query: str, hits, limit: int):
+        model = self._load() if self.enabled else None
+        if model is None or not hits:
+            return hits[:limit]
+        scores = model.predict([(query, hit["payload"]["text"]) for hit in hits])
+        ranked = sorted(zip(hits, scores), key=lambda item: item[1], reverse=True)[:limit]
+        return [{**hit, "score": float(score)} for hit, score in ranked]
+
+
+class KnowledgeFilters:
+    """Metadata filters for a chat turn, derived from the conversation.
+
+    Products and versions are recognised among the values present in the knowledge
+    base, case-insensitively; the newest message naming one decides. The language
+    comes from the session context when the client sets one.
+    """
+
+    def __init__(self, fields=("product", "version")):
+        self.fields = fields
+        self.values = None
+        self.patterns = {}
+        self.canonical = {}
+
+    def update(self, values: dict):
+        """Recompile the patterns when the knowledge base's products or versions change"""
+        if values == self.values:
+            return
+        self.values = values
+        self.patterns = {}
+        self.canonical = {}
+        for field in self.fields:
+            names = sorted(values.get(field, ()), key=len, reverse=True)
+            if not names:
+                continue
+            alternatives = "|".join(re.escape(name.lower()) for name in names)
+            prefix = VERSION_PREFIX if field == "version" else r"(?<![\w.])"
+            self.patterns[field] = re.compile(f"{prefix}({alternatives})(?!\\w|\\.\\d)")
+            self.canonical[field] = {name.lower(): name for name in names}
+
+    def extract(self, messages, context: dict):
+        """Filters from messages (newest first) and the session context"""
+        filters = {}
+        for field, pattern in self.patterns.items():
+            for text in messages:
+                found = {self.canonical[field][name] for name in pattern.findall(text.lower())}
+                if found:
+                    filters[field] = sorted(found)
+                    break
+        if context.get("language"):
+            filters["language"] = [context["language"]]
+        return filters
@@ -0,0 +1,38 @@
+from extraction import extractor
+
+# Canned replies for small talk that needs neither the knowledge base nor an LLM
+TEMPLATES = {
+    "greeting": "Hello! I'm your Cyfuture customer support assistant. I can help you file a complaint, check on an existing complaint or answer questions about our services. How can I help you today?",
+    "thanks": "You're welcome! Is there anything else I can help you with?",
+    "goodbye": "Thank you for contacting Cyfuture support. Have a great day!",
+    "acknowledgement": "Alright! Let me know if there's anything else I can help you with.",
+}
+
+# Route -> upstream calls it skips compared with the full RAG route
+AVOIDED_CALLS = {
+    "template": ("embedding", "retrieval", "llm"),
+    "chitchat": ("embedding", "retrieval", "main_model"),
+    "cache": ("retrieval", "llm"),
+    "rag": (),
+}
+
+
+def choose_route(user_message: str, extraction=None):
+    """template, chitchat or rag for a message that is not a complaint lookup or filing"""
+    extraction = extraction or extractor.extract(user_message)
+    if extraction.small_talk in TEMPLATES:
+        return "template"
+    if extraction.small_talk == "chitchat":
+        return "chitchat"
+    return "rag"
+
+
+def avoided_calls(route_counts: dict):
+    """How many upstream calls of each kind the cheaper routes saved"""
+    avoided = {"embedding": 0, "retrieval": 0, "llm": 0, "main_model": 0}
+    for route, count in route_counts.items():
+        for call in AVOIDED_CALLS.get(route, ()):
+            avoided[call] += count
+    # A skipped LLM call is also a skipped main-model call
+    avoided["main_model"] += avoided["llm"]
+    return avoided
@@ -0,0 +1,92 @@
+import copy
+import time
+from collections import OrderedDict
+from datetime import datetime
+from settings import *
+from tracing import tracer
+
+
+def new_complaint_context(language=None):
+    return {
+        'name': None,
+        'phone_number': None,
+        'email': None,
+        'complaint_details': None,
+        'collecting_complaint': False,
+        'language': language
+    }
+
+
+def new_session_state():
+    return {
+        'conversation_history': [],
+        'complaint_context': new_complaint_context()
+    }
+
+
+class InMemorySessionStore:
+    """Chat sessions kept in this process; only suitable for a single worker"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    async def get(self, session_id: str):
+        entry = self.sessions.get(session_id)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return new_session_state()
+        return copy.deepcopy(entry[1])
+
+    async def save(self, session_id: str, state: dict):
+        self.sessions[session_id] = (time.time(), copy.deepcopy(state))
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    async def delete(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    async def ensure_indexes(self):
+        pass
+
+
+class MongoSessionStore:
+    """Chat sessions shared by every worker through MongoDB, expired by a TTL index"""
+
+    def __init__(self, collection=None, ttl=SESSION_TTL):
+        if collection is None:
+            from database import sessions_collection
+            collection = sessions_collection
+        self.collection = collection
+        self.ttl = ttl
+
+    async def get(self, session_id: str):
+        with tracer.span("mongo.sessions.find_one"):
+            doc = await self.collection.find_one({"_id": session_id})
+        if doc is None:
+            return new_session_state()
+        return doc["state"]
+
+    async def save(self, session_id: str, state: dict):
+        with tracer.span("mongo.sessions.replace_one"):
+            await self.collection.replace_one(
+                {"_id": session_id},
+                {"_id": session_id, "state": state, "updated_at": datetime.utcnow()},
+                upsert=True
+            )
+
+    async def delete(self, session_id: str):
+        await self.collection.delete_one({"_id": session_id})
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("updated_at", expireAfterSeconds=self.ttl)
+
+
+def create_session_store(kind=SESSION_STORE):
+    """Build the session store selected by the SESSION_STORE setting"""
+    if kind == "memory":
+        return InMemorySessionStore()
+    if kind == "mongo":
+        return MongoSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE {kind!r}, expected 'memory' or 'mongo'")
@@ -9,4 +9,86 @@ QDRANT_KEY=os.getenv("qdrant_key")
 OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
 FASTAPI_BASE_URL=os.getenv("FASTAPI_BASE_URL")
 MONGODB_URL=os.getenv("MONGODB_URL")
-DATABASE_NAME=os.getenv("DATABASE_NAME")
\ No newline at end of file
+DATABASE_NAME=os.getenv("DATABASE_NAME")
+
+OPENAI_BASE_URL=os.getenv("OPENAI_BASE_URL")
+
+EMBEDDING_MODEL=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+# 0 keeps the model's full length; text-embedding-3 models can return shorter vectors
+EMBEDDING_DIMENSIONS=int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+EMBEDDING_BATCH_SIZE=int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY=int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES=int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+EMBEDDING_CACHE_PATH=os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_SIZE=int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "10000"))
+EMBEDDING_CACHE_MAX_ENTRIES=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+COLLECTION_NAME=os.getenv("QDRANT_COLLECTION", "customer_complaints_collection")
+INDEX_MANIFEST_PATH=os.getenv("INDEX_MANIFEST_PATH", ".index_manifest.json")
+
+UPSERT_BATCH_SIZE=int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+
+RESPONSE_CACHE_THRESHOLD=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+RESPONSE_CACHE_TTL=int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE=int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+
+RAG_MAX_CONCURRENCY=int(os.getenv("RAG_MAX_CONCURRENCY", "16"))
+RAG_POOL_SIZE=int(os.getenv("RAG_POOL_SIZE", "32"))
+EMBEDDING_TIMEOUT=float(os.getenv("EMBEDDING_TIMEOUT", "10"))
+QDRANT_TIMEOUT=int(os.getenv("QDRANT_TIMEOUT", "10"))
+LLM_TIMEOUT=float(os.getenv("LLM_TIMEOUT", "60"))
+
+SESSION_STORE=os.getenv("SESSION_STORE", "memory")
+SESSION_TTL=int(os.getenv("SESSION_TTL", "86400"))
+SESSION_HISTORY_LIMIT=int(os.getenv("SESSION_HISTORY_LIMIT", "50"))
+
+API_CONNECT_TIMEOUT=float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT=float(os.getenv("API_READ_TIMEOUT", "30"))
+API_MAX_RETRIES=int(os.getenv("API_MAX_RETRIES", "3"))
+API_POOL_SIZE=int(os.getenv("API_POOL_SIZE", "20"))
+
+CHAT_DISPLAY_MESSAGES=int(os.getenv("CHAT_DISPLAY_MESSAGES", "20"))
+CHAT_MAX_MESSAGES=int(os.getenv("CHAT_MAX_MESSAGES", "200"))
+
+COMPLAINT_CACHE_TTL=int(os.getenv("COMPLAINT_CACHE_TTL", "300"))
+COMPLAINT_CACHE_NEGATIVE_TTL=int(os.getenv("COMPLAINT_CACHE_NEGATIVE_TTL", "30"))
+COMPLAINT_CACHE_SIZE=int(os.getenv("COMPLAINT_CACHE_SIZE", "10000"))
+COMPLAINT_CACHE_REDIS_URL=os.getenv("COMPLAINT_CACHE_REDIS_URL")
+
+COMPLAINT_WRITE_BATCHING=os.getenv("COMPLAINT_WRITE_BATCHING", "false").lower() == "true"
+COMPLAINT_BATCH_SIZE=int(os.getenv("COMPLAINT_BATCH_SIZE", "100"))
+COMPLAINT_BATCH_WINDOW=float(os.getenv("COMPLAINT_BATCH_WINDOW", "0.005"))
+
+COMPLAINT_INDEXING=os.getenv("COMPLAINT_INDEXING", "true").lower() == "true"
+COMPLAINT_VECTOR_COLLECTION=os.getenv("COMPLAINT_VECTOR_COLLECTION", "complaint_details_collection")
+COMPLAINT_INDEX_WINDOW=float(os.getenv("COMPLAINT_INDEX_WINDOW", "1.0"))
+COMPLAINT_CLUSTER_THRESHOLD=float(os.getenv("COMPLAINT_CLUSTER_THRESHOLD", "0.9"))
+
+VECTOR_STORE=os.getenv("VECTOR_STORE", "qdrant")
+VECTOR_STORE_PATH=os.getenv("VECTOR_STORE_PATH", ".vector_store")
+VECTOR_STORE_HNSW_THRESHOLD=int(os.getenv("VECTOR_STORE_HNSW_THRESHOLD", "50000"))
+VECTOR_QUANTIZATION=os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_OVERSAMPLING=float(os.getenv("VECTOR_OVERSAMPLING", "3.0"))
+
+RETRIEVAL_MODE=os.getenv("RETRIEVAL_MODE", "hybrid")
+RETRIEVAL_LIMIT=int(os.getenv("RETRIEVAL_LIMIT", "3"))
+RETRIEVAL_CANDIDATES=int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RRF_K=int(os.getenv("RRF_K", "60"))
+# Scope retrieval to the products/versions named in the last few user messages
+KNOWLEDGE_FILTERS=os.getenv("KNOWLEDGE_FILTERS", "true").lower() == "true"
+KNOWLEDGE_FILTER_MESSAGES=int(os.getenv("KNOWLEDGE_FILTER_MESSAGES", "6"))
+# Language recorded for ingested documents unless their metadata says otherwise
+DOCUMENT_LANGUAGE=os.getenv("DOCUMENT_LANGUAGE", "en")
+BM25_INDEX_PATH=os.getenv("BM25_INDEX_PATH", ".bm25_index.json")
+RERANKER_MODEL=os.getenv("RERANKER_MODEL", "")
+
+CHAT_MODEL=os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+PROMPT_TOKEN_BUDGET=int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+KNOWLEDGE_TOKEN_BUDGET=int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "1500"))
+PROMPT_HISTORY_MESSAGES=int(os.getenv("PROMPT_HISTORY_MESSAGES", "10"))
+
+FAST_CHAT_MODEL=os.getenv("FAST_CHAT_MODEL", "gpt-4o-mini")
+FAST_MAX_TOKENS=int(os.getenv("FAST_MAX_TOKENS", "150"))
+
+TRACE_EXPORTER=os.getenv("TRACE_EXPORTER", "none")
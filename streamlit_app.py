@@ -1,8 +1,9 @@
 import streamlit as st
-import re
-from datetime import datetime
-from rag_service import rag_service
-from api_client import api_client
+import time
+import itertools
+from uuid import uuid4
+from api_client import APIClient
+from settings import CHAT_DISPLAY_MESSAGES, CHAT_MAX_MESSAGES
 
 # Page configuration
 st.set_page_config(
@@ -60,174 +61,107 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+WELCOME_MESSAGE = {
+    "role": "assistant",
+    "content": "Hello! I'm your Cyfuture customer support assistant. I can help you file complaints or retrieve complaint details. How can I assist you today?"
+}
+
+@st.cache_resource
+def get_api_client():
+    """One pooled API client per server process, kept across reruns and script reloads"""
+    return APIClient()
+
+api_client = get_api_client()
+
+def new_complaint_context():
+    return {
+        'name': None,
+        'phone_number': None,
+        'email': None,
+        'complaint_details': None,
+        'collecting_complaint': False
+    }
+
 def initialize_session_state():
     """Initialize session state variables"""
-    if 'conversation_history' not in st.session_state:
-        st.session_state.conversation_history = []
+    # Conversation history and complaint context live on the chat API, keyed by this ID
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = str(uuid4())
     
     if 'complaint_context' not in st.session_state:
-        st.session_state.complaint_context = {
-            'name': None,
-            'phone_number': None,
-            'email': None,
-            'complaint_details': None,
-            'collecting_complaint': False
-        }
+        st.session_state.complaint_context = new_complaint_context()
     
+    if 'last_turn_timing' not in st.session_state:
+        st.session_state.last_turn_timing = {}
+
     if 'messages' not in st.session_state:
-        st.session_state.messages = [
-            {
-                "role": "assistant",
-                "content": "Hello! I'm your Cyfuture customer support assistant. I can help you file complaints or retrieve complaint details. How can I assist you today?"
-            }
-        ]
+        st.session_state.messages = [WELCOME_MESSAGE]
 
-def validate_email(email):
-    """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+def clear_conversation():
+    """Start a new session; runs as a button callback, before the rerun renders the page"""
+    api_client.reset_chat(st.session_state.session_id)
+    st.session_state.messages = [WELCOME_MESSAGE]
+    st.session_state.complaint_context = new_complaint_context()
+    st.session_state.last_turn_timing = {}
+    st.session_state.session_id = str(uuid4())
 
-def validate_phone(phone):
-    """Validate phone number format"""
-    # Remove any non-digit characters
-    digits_only = re.sub(r'\D', '', phone)
-    return len(digits_only) >= 10
+def add_message(role, content):
+    """Append to the displayed transcript, dropping the oldest messages past CHAT_MAX_MESSAGES"""
+    messages = st.session_state.messages
+    messages.append({"role": role, "content": content})
+    if len(messages) > CHAT_MAX_MESSAGES:
+        # The server keeps its own history, so this only trims what the browser shows
+        del messages[:len(messages) - CHAT_MAX_MESSAGES]
 
-def extract_missing_fields(context):
-    """Check which fields are missing for complaint creation"""
-    missing = []
-    if not context['name']:
-        missing.append('name')
-    if not context['phone_number']:
-        missing.append('phone number')
-    if not context['email']:
-        missing.append('email address')
-    if not context['complaint_details']:
-        missing.append('complaint details')
-    return missing
+def message_html(message):
+    if message["role"] == "user":
+        return f'<div class="chat-message user-message"><strong>You:</strong> {message["content"]}</div>'
+    return f'<div class="chat-message bot-message"><strong>Assistant:</strong> {message["content"]}</div>'
 
-def update_complaint_context(user_input, context):
-    """Update complaint context based on user input"""
-    # Extract contact information
-    contact_info = rag_service.extract_contact_info(user_input)
-    
-    # Update email if found and not already set
-    if 'email' in contact_info and not context['email']:
-        if validate_email(contact_info['email']):
-            context['email'] = contact_info['email']
-    
-    # Update phone if found and not already set
-    if 'phone_number' in contact_info and not context['phone_number']:
-        if validate_phone(contact_info['phone_number']):
-            context['phone_number'] = contact_info['phone_number']
-    
-    # Update name if it looks like a name (simple heuristic)
-    if not context['name']:
-        # If the input is short and doesn't contain typical complaint words, it might be a name
-        words = user_input.strip().split()
-        if len(words) <= 3 and len(user_input) < 50:
-            complaint_keywords = ['complaint', 'issue', 'problem', 'delayed', 'damaged', '@', 'phone', 'number']
-            if not any(keyword in user_input.lower() for keyword in complaint_keywords):
-                # Check if it's not an email or phone number
-                if not re.search(r'@|^\d+$', user_input):
-                    context['name'] = user_input.strip()
-    
-    # Update complaint details if it's descriptive
-    if not context['complaint_details'] and len(user_input) > 20:
-        if any(keyword in user_input.lower() for keyword in ['order', 'delivery', 'service', 'product', 'issue', 'problem']):
-            context['complaint_details'] = user_input.strip()
+def render_messages(messages):
+    """Render the last CHAT_DISPLAY_MESSAGES messages; older ones are collapsed into one element"""
+    older, recent = messages[:-CHAT_DISPLAY_MESSAGES], messages[-CHAT_DISPLAY_MESSAGES:]
+    if older:
+        with st.expander(f"Earlier messages ({len(older)})"):
+            st.markdown("".join(message_html(message) for message in older), unsafe_allow_html=True)
+    for message in recent:
+        st.markdown(message_html(message), unsafe_allow_html=True)
 
-def create_complaint_from_context(context):
-    """Create complaint using collected context"""
-    complaint_data = {
-        "name": context['name'],
-        "phone_number": context['phone_number'],
-        "email": context['email'],
-        "complaint_details": context['complaint_details']
-    }
-    
-    result = api_client.create_complaint(complaint_data)
-    return result
+def handle_user_message(user_input, stream=False):
+    """Send user message to the chat API and return the response (a token generator when stream=True)"""
+    session_id = st.session_state.session_id
+    if stream:
+        return stream_chat_tokens(session_id, user_input)
 
-def format_complaint_details(complaint):
-    """Format complaint details for display"""
-    formatted_date = datetime.fromisoformat(complaint['created_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M:%S')
-    
-    return f"""
-**Complaint ID:** {complaint['complaint_id']}  
-**Name:** {complaint['name']}  
-**Phone:** {complaint['phone_number']}  
-**Email:** {complaint['email']}  
-**Details:** {complaint['complaint_details']}  
-**Created At:** {formatted_date}
-"""
+    result = api_client.chat(session_id, user_input)
+    if 'error' in result:
+        return f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {result['error']}"
+    st.session_state.complaint_context = result['complaint_context']
+    return result['response']
 
-def handle_user_message(user_input):
-    """Process user message and generate appropriate response"""
-    context = st.session_state.complaint_context
-    
-    # Check if user wants to query complaint details
-    if rag_service.is_complaint_query_intent(user_input):
-        print("input", user_input)
-        complaint_id = rag_service.extract_complaint_id(user_input)
-        print("complaint id : ", complaint_id)
-        if complaint_id:
-            result = api_client.get_complaint(complaint_id)
-            if 'error' in result:
-                return f"I couldn't find a complaint with ID {complaint_id}. Please check the ID and try again."
-            else:
-                return f"Here are the details for complaint {complaint_id}:\n\n{format_complaint_details(result)}"
+def stream_chat_tokens(session_id, user_input):
+    """Yield response tokens from the chat API and pick up the updated complaint context"""
+    for event, data in api_client.chat_stream(session_id, user_input):
+        if event == "token":
+            yield data
+        elif event == "done":
+            st.session_state.complaint_context = data['complaint_context']
         else:
-            return "Please provide the complaint ID you'd like me to look up."
-    
-    # Check if user wants to file a complaint
-    if rag_service.is_complaint_filing_intent(user_input) or context['collecting_complaint']:
-        context['collecting_complaint'] = True
-        
-        # Update context with any information from the current message
-        update_complaint_context(user_input, context)
-        
-        # Check what information is still missing
-        missing_fields = extract_missing_fields(context)
-        
-        if missing_fields:
-            # Ask for the next missing field
-            if 'name' in missing_fields:
-                return "I'm sorry to hear about your issue. To help you file a complaint, I'll need some information. Could you please provide your full name?"
-            elif 'phone number' in missing_fields:
-                return f"Thank you, {context['name']}. What is your phone number?"
-            elif 'email address' in missing_fields:
-                return "Got it. Please provide your email address."
-            elif 'complaint details' in missing_fields:
-                return "Thanks. Could you please provide more details about your complaint?"
-        else:
-            # All information collected, create the complaint
-            result = create_complaint_from_context(context)
-            
-            if 'error' in result:
-                return f"I apologize, but there was an error creating your complaint: {result['error']}. Please try again or contact our support team directly."
-            else:
-                # Reset the complaint context
-                st.session_state.complaint_context = {
-                    'name': None,
-                    'phone_number': None,
-                    'email': None,
-                    'complaint_details': None,
-                    'collecting_complaint': False
-                }
-                return f"Your complaint has been successfully registered! Your complaint ID is: **{result['complaint_id']}**. You'll hear back from our team soon. Is there anything else I can help you with?"
-    
-    # Generate general response using RAG
-    return rag_service.generate_response(user_input, context, st.session_state.conversation_history)
+            yield f"I apologize, but I'm having trouble processing your request right now. Please try again. Error: {data}"
 
-def main():
-    """Main Streamlit application"""
-    initialize_session_state()
-    
-    # Header
-    st.markdown('<h1 class="main-header">🤖 Cyfuture Customer Support Chatbot</h1>', unsafe_allow_html=True)
-    
-    # Sidebar with information
+def render_streamed_response(tokens, start):
+    """Render tokens as they arrive and return the full response"""
+    placeholder = st.empty()
+    response = ""
+    for token in tokens:
+        if not response:
+            st.session_state.last_turn_timing['time_to_first_token'] = time.perf_counter() - start
+        response += token
+        placeholder.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {response}▌</div>', unsafe_allow_html=True)
+    placeholder.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {response}</div>', unsafe_allow_html=True)
+    return response
+
+def render_sidebar():
     with st.sidebar:
         st.header("ℹ️ How I Can Help")
         st.markdown("""
@@ -254,58 +188,45 @@ def main():
             st.write(f"✅ Email: {context['email'] or '❌ Missing'}")
             st.write(f"✅ Details: {'✅ Provided' if context['complaint_details'] else '❌ Missing'}")
         
-        # Clear conversation button
-        if st.button("🔄 Clear Conversation"):
-            st.session_state.messages = [
-                {
-                    "role": "assistant",
-                    "content": "Hello! I'm your Cyfuture customer support assistant. I can help you file complaints or retrieve complaint details. How can I assist you today?"
-                }
-            ]
-            st.session_state.complaint_context = {
-                'name': None,
-                'phone_number': None,
-                'email': None,
-                'complaint_details': None,
-                'collecting_complaint': False
-            }
-            st.session_state.conversation_history = []
-            st.rerun()
+        timing = st.session_state.last_turn_timing
+        if timing.get('time_to_first_token') is not None:
+            st.caption(f"Last response: first token in {timing['time_to_first_token']:.2f}s, complete in {timing.get('total_time', 0):.2f}s")
+        if timing.get('render_time') is not None:
+            st.caption(f"Page rendered in {timing['render_time'] * 1000:.0f}ms ({len(st.session_state.messages)} messages)")
+        
+        st.button("🔄 Clear Conversation", on_click=clear_conversation)
+
+def main():
+    """Main Streamlit application"""
+    render_start = time.perf_counter()
+    initialize_session_state()
+    
+    # Header
+    st.markdown('<h1 class="main-header">🤖 Cyfuture Customer Support Chatbot</h1>', unsafe_allow_html=True)
     
     # Main chat interface
     st.header("💬 Chat")
-    
-    # Display chat messages
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {message["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {message["content"]}</div>', unsafe_allow_html=True)
+    render_messages(st.session_state.messages)
+    render_time = time.perf_counter() - render_start
     
     # Chat input
     if prompt := st.chat_input("Type your message here..."):
-        # Add user message to chat history
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        # Add to conversation history for RAG context
-        st.session_state.conversation_history.append({"role": "user", "content": prompt})
+        add_message("user", prompt)
+        st.markdown(message_html({"role": "user", "content": prompt}), unsafe_allow_html=True)
         
-        # Display user message
-        st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {prompt}</div>', unsafe_allow_html=True)
-        
-        # Generate and display assistant response
+        # Generate and display assistant response, streaming general answers token by token
+        start = time.perf_counter()
+        st.session_state.last_turn_timing = {}
         with st.spinner("Thinking..."):
-            response = handle_user_message(prompt)
-        
-        # Add assistant response to chat history
-        st.session_state.messages.append({"role": "assistant", "content": response})
-        st.session_state.conversation_history.append({"role": "assistant", "content": response})
-        
-        # Display assistant response
-        st.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {response}</div>', unsafe_allow_html=True)
-        
-        # Rerun to update the display
-        st.rerun() 
+            tokens = handle_user_message(prompt, stream=True)
+            first_token = next(tokens, "")
+        response = render_streamed_response(itertools.chain([first_token], tokens), start)
+        st.session_state.last_turn_timing['total_time'] = time.perf_counter() - start
+        add_message("assistant", response)
+
+    # Rendered last so it shows this turn's complaint progress and timing without a second run
+    st.session_state.last_turn_timing['render_time'] = render_time
+    render_sidebar()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from settings import *
+from metrics import LatencyStats
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; spans of the same request share a trace ID"""
+
+    def __init__(self, name: str, trace_id: str = None, parent_id: str = None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.perf_counter()
+        self.start_time = time.time()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Records spans into per-name latency histograms and hands them to an exporter.
+
+    TRACE_EXPORTER=none (default) only keeps the histograms; "log" also prints
+    every finished span as one JSON line.
+    """
+
+    def __init__(self, exporter=TRACE_EXPORTER):
+        self.exporter = exporter
+        self.latency = LatencyStats()
+
+    def start_span(self, name: str, parent: Span = None, **attributes):
+        parent = parent or current_span.get()
+        if parent is None:
+            return Span(name, attributes=attributes)
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    def finish(self, span: Span):
+        span.duration = time.perf_counter() - span.start
+        self.latency.observe(span.name, span.duration)
+        if self.exporter == "log":
+            print(json.dumps(span.to_dict(), default=str))
+
+    @contextmanager
+    def span(self, name: str, activate=True, parent: Span = None, **attributes):
+        """Time a block; activate=False for blocks that cross a yield in a generator"""
+        span = self.start_span(name, parent, **attributes)
+        token = current_span.set(span) if activate else None
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            if token is not None:
+                current_span.reset(token)
+            self.finish(span)
+
+    def bind(self, coro):
+        """Carry the caller's current span into a coroutine run on another loop or thread"""
+        span = current_span.get()
+
+        async def bound():
+            current_span.set(span)
+            return await coro
+
+        return bound()
+
+    def headers(self):
+        """traceparent header for an outgoing request, propagating the current trace"""
+        span = current_span.get()
+        return {"traceparent": span.traceparent()} if span else {}
+
+    def parse_traceparent(self, header: str):
+        """Remote parent span from an incoming traceparent header, or None"""
+        match = TRACEPARENT.match((header or "").strip().lower())
+        if not match:
+            return None
+        remote = Span("remote", match.group(1))
+        remote.span_id = match.group(2)
+        return remote
+
+
+class TracingMiddleware:
+    """ASGI middleware: one span per HTTP request, ended when the last body chunk is sent"""
+
+    def __init__(self, app, tracer: Tracer, exclude=("/metrics",)):
+        self.app = app
+        self.tracer = tracer
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        parent = self.tracer.parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        span = self.tracer.start_span(f"{scope['method']} {scope['path']}", parent)
+        token = current_span.set(span)
+        finished = False
+
+        async def traced_send(message):
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                span.set(status_code=message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", span.trace_id.encode())]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not finished:
+                finished = True
+                self.finish(scope, span)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        except Exception as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            current_span.reset(token)
+            if not finished:
+                self.finish(scope, span)
+
+    def finish(self, scope, span: Span):
+        # Name by route template so /complaints/{complaint_id} is one histogram, not one per ID
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        span.name = f"{scope['method']} {path}"
+        self.tracer.finish(span)
+
+
+# Create global instance
+tracer = Tracer()
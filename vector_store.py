@@ -0,0 +1,726 @@
+import os
+import json
+import asyncio
+import argparse
+import threading
+import numpy as np
+from settings import *
+from retrieval import filter_values, payload_matches
+# qdrant_client is imported where it is used: it takes about a second to import,
+# which the local store, the Streamlit client and worker start-up should not pay
+
+VECTOR_SIZE = EMBEDDING_DIMENSIONS or 1536
+QUANTIZATIONS = ("none", "int8", "binary")
+# Set bits in every byte value, for Hamming distances between packed binary codes
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Rows decoded or compared at a time when scanning quantized codes
+QUANTIZED_BLOCK = 1024
+# Share of deleted rows at which the local store is compacted on flush
+COMPACT_RATIO = 0.25
+
+
+def hamming_distances(codes, query_bits):
+    """Differing bits between each row of packed codes and the packed query"""
+    if hasattr(np, "bitwise_count"):
+        # NumPy 2 counts bits natively; comparing 64 bits at a time cuts the work 8x
+        return np.bitwise_count(codes.view(np.uint64) ^ query_bits.view(np.uint64)).sum(axis=1, dtype=np.int32)
+    return POPCOUNT[codes ^ query_bits].sum(axis=1, dtype=np.int32)
+
+
+def rebuild_command(collection: str):
+    if collection == COMPLAINT_VECTOR_COLLECTION:
+        return "complaint_similarity.py backfill --rebuild"
+    return "data_store.py --rebuild"
+
+
+def check_quantization(quantization: str):
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown VECTOR_QUANTIZATION {quantization!r}, expected one of {', '.join(QUANTIZATIONS)}")
+    return quantization
+
+
+class QdrantVectorStore:
+    """Vector store backed by the Qdrant server at QDRANT_URL"""
+
+    def __init__(self, collection=COLLECTION_NAME, size=VECTOR_SIZE, quantization=VECTOR_QUANTIZATION, oversampling=VECTOR_OVERSAMPLING):
+        self.collection = collection
+        self.size = size
+        self.quantization = check_quantization(quantization)
+        self.oversampling = oversampling
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from qdrant_client import QdrantClient
+            self._client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_KEY, timeout=60)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from qdrant_client import AsyncQdrantClient
+            self._async_client = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_KEY, timeout=QDRANT_TIMEOUT, pool_size=RAG_POOL_SIZE)
+        return self._async_client
+
+    def vectors_config(self):
+        from qdrant_client import models
+        # With quantization only the compact codes need to stay in RAM; the originals
+        # are read from disk for the oversampled candidates when rescoring
+        return models.VectorParams(size=self.size, distance=models.Distance.COSINE, on_disk=self.quantization != "none")
+
+    def quantization_config(self):
+        from qdrant_client import models
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def create_collection(self):
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=self.vectors_config(),
+            quantization_config=self.quantization_config()
+        )
+
+    def recreate(self):
+        if self.client.collection_exists(self.collection):
+            self.client.delete_collection(self.collection)
+        self.create_collection()
+
+    def ensure(self):
+        """Create the collection if it is missing, returns True when it was created.
+
+        An existing collection must match the configured vector size and quantization;
+        otherwise every query would send vectors it rejects.
+        """
+        if self.client.collection_exists(self.collection):
+            self.check_config()
+            return False
+        self.create_collection()
+        return True
+
+    def check_config(self):
+        from qdrant_client import models
+        config = self.client.get_collection(self.collection).config
+        vectors = config.params.vectors
+        size = vectors.size if isinstance(vectors, models.VectorParams) else None
+        quantization = config.quantization_config
+        if isinstance(quantization, models.ScalarQuantization):
+            quantization = "int8"
+        elif isinstance(quantization, models.BinaryQuantization):
+            quantization = "binary"
+        elif quantization is None:
+            quantization = "none"
+        else:
+            quantization = type(quantization).__name__
+        if (size, quantization) != (self.size, self.quantization):
+            raise ValueError(
+                f"{self.collection} holds {size}-dimension vectors with {quantization} quantization but "
+                f"{self.size} dimensions with {self.quantization} quantization are configured, "
+                f"rebuild it with {rebuild_command(self.collection)}"
+            )
+
+    def create_payload_index(self, field: str):
+        """Keyword index on a payload field, so filtered searches only visit matching points"""
+        from qdrant_client import models
+        self.client.create_payload_index(
+            collection_name=self.collection,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
+    def query_filter(self, filters):
+        """Qdrant filter with the same meaning as payload_matches: a wanted value, or the field not set"""
+        if not filters:
+            return None
+        from qdrant_client import models
+        return models.Filter(must=[
+            models.Filter(should=[
+                models.FieldCondition(key=field, match=models.MatchAny(any=filter_values(wanted))),
+                models.IsEmptyCondition(is_empty=models.PayloadField(key=field)),
+            ])
+            for field, wanted in filters.items()
+        ])
+
+    def upsert(self, points):
+        self.client.upsert(collection_name=self.collection, points=points)
+
+    def delete(self, point_ids):
+        from qdrant_client import models
+        self.client.delete(
+            collection_name=self.collection,
+            points_selector=models.PointIdsList(points=list(point_ids))
+        )
+
+    def flush(self):
+        pass
+
+    def count(self):
+        return self.client.count(self.collection).count
+
+    def scroll(self, batch_size=256):
+        """Yield every point with its vector"""
+        from qdrant_client.http.models import PointStruct
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=batch_size,
+                offset=offset,
+                with_vectors=True,
+                with_payload=True
+            )
+            for point in points:
+                yield PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+            if offset is None:
+                return
+
+    def retrieve(self, point_ids):
+        """Vectors of the points that exist, keyed by ID"""
+        points = self.client.retrieve(collection_name=self.collection, ids=list(point_ids), with_vectors=True)
+        return {str(point.id): point.vector for point in points}
+
+    def search_params(self):
+        """Search the quantized codes for limit * oversampling candidates, then rescore them with the originals"""
+        if self.quantization == "none":
+            return None
+        from qdrant_client import models
+        return models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=self.oversampling)
+        )
+
+    async def asearch(self, vector, limit: int, filters=None):
+        result = await self.async_client.query_points(
+            collection_name=self.collection,
+            query=vector,
+            query_filter=self.query_filter(filters),
+            limit=limit,
+            search_params=self.search_params(),
+            timeout=QDRANT_TIMEOUT
+        )
+        return [{"id": str(point.id), "score": point.score, "payload": point.payload} for point in result.points]
+
+
+class LocalVectorStore:
+    """In-process vector store: a memory-mapped float32 matrix searched by brute force.
+
+    Vectors are L2-normalised on write, so cosine similarity is one BLAS matrix-vector
+    product. Above VECTOR_STORE_HNSW_THRESHOLD points an HNSW index is used instead,
+    if hnswlib is installed.
+
+    On disk the rows live in a raw float32 file and the IDs and payloads in an
+    append-only JSON lines log, so writes only append: new rows at the end, updated
+    rows in place, deletes as tombstones. meta.json records how many rows and log
+    bytes are committed, and readers reload when it changes, applying only the new
+    log entries. Once a quarter of the rows are deleted, flush compacts into a new
+    generation of files.
+
+    With VECTOR_QUANTIZATION set, searches scan int8 or 1-bit codes built in memory
+    from the matrix, then rescore the oversampled candidates against the float32 rows,
+    so only the codes and those rows need to be resident.
+
+    Filtered searches score only the rows whose payload matches, found through the
+    payload indexes listed in meta.json for indexed fields.
+    """
+
+    def __init__(self, collection=COLLECTION_NAME, size=VECTOR_SIZE, path=VECTOR_STORE_PATH,
+                 quantization=VECTOR_QUANTIZATION, oversampling=VECTOR_OVERSAMPLING):
+        self.collection = collection
+        self.size = size
+        self.quantization = check_quantization(quantization)
+        self.oversampling = oversampling
+        self.directory = os.path.join(path, collection)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock = threading.Lock()
+        self.loaded_version = None
+        self.dirty = False
+        self.indexed_fields = []
+        self.generation = None
+        # Bytes of the points log applied to (or written by) this instance
+        self.log_size = 0
+        self._reset()
+
+    def _reset(self):
+        self.ids = []
+        self.payloads = []
+        self.positions = {}
+        self.deleted = set()
+        self.matrix = np.zeros((0, self.size), dtype=np.float32)
+        self._invalidate()
+
+    def _invalidate(self):
+        """Forget everything derived from the rows; rebuilt on the next search that needs it"""
+        self.hnsw = None
+        self.codes = None
+        self.scale = None
+        self.field_rows = {}
+        self.alive = None
+
+    def _paths(self, generation):
+        return (
+            os.path.join(self.directory, f"vectors.{generation}.f32"),
+            os.path.join(self.directory, f"points.{generation}.jsonl"),
+        )
+
+    def _version(self):
+        try:
+            return os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """(Re)load from disk when another process has changed the store"""
+        version = self._version()
+        if version == self.loaded_version or self.dirty:
+            return
+        if version is None:
+            self._reset()
+            self.generation = None
+            self.log_size = 0
+            self.loaded_version = None
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta["size"] != self.size:
+            raise ValueError(
+                f"{self.directory} holds {meta['size']}-dimension vectors but {self.size} are configured, "
+                f"rebuild it with {rebuild_command(self.collection)}"
+            )
+        if "payloads" in meta:
+            self._migrate(meta)
+            return
+        if meta["generation"] != self.generation:
+            self._reset()
+            self.generation = meta["generation"]
+            self.log_size = 0
+        try:
+            self._replay(meta["log_size"])
+        except FileNotFoundError:
+            # Compacted between reading meta.json and opening the log; the next call sees the new generation
+            return
+        self.indexed_fields = meta.get("indexes", [])
+        self._map()
+        self._invalidate()
+        self.loaded_version = version
+
+    def _replay(self, log_size: int):
+        """Apply the log entries written since the last load"""
+        if log_size <= self.log_size:
+            return
+        with open(self._paths(self.generation)[1], "rb") as f:
+            f.seek(self.log_size)
+            data = f.read(log_size - self.log_size)
+        for line in data.splitlines():
+            self._apply(json.loads(line))
+        self.log_size = log_size
+
+    def _apply(self, record: dict):
+        row = record["row"]
+        if record.get("deleted"):
+            self.positions.pop(self.ids[row], None)
+            self.ids[row] = None
+            self.payloads[row] = None
+            self.deleted.add(row)
+            return
+        if row == len(self.ids):
+            self.ids.append(record["id"])
+            self.payloads.append(record["payload"])
+        else:
+            self.payloads[row] = record["payload"]
+        self.positions[record["id"]] = row
+
+    def _map(self):
+        if self.ids:
+            self.matrix = np.memmap(self._paths(self.generation)[0], dtype=np.float32, mode="r", shape=(len(self.ids), self.size))
+        else:
+            self.matrix = np.zeros((0, self.size), dtype=np.float32)
+
+    def _normalize(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _write_meta(self):
+        with open(f"{self.meta_path}.tmp", 'w') as f:
+            json.dump({
+                "size": self.size,
+                "generation": self.generation,
+                "rows": len(self.ids),
+                "log_size": self.log_size,
+                "indexes": self.indexed_fields,
+            }, f)
+        os.replace(f"{self.meta_path}.tmp", self.meta_path)
+        self.dirty = False
+        self.loaded_version = self._version()
+
+    def _write_generation(self, generation, matrix, rows, records):
+        """Write a new pair of files holding the given rows, point meta.json at them and drop the old files"""
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_path, points_path = self._paths(generation)
+        with open(vectors_path, "wb") as f:
+            for start in range(0, len(rows), QUANTIZED_BLOCK):
+                f.write(np.ascontiguousarray(matrix[rows[start:start + QUANTIZED_BLOCK]], dtype=np.float32).tobytes())
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(points_path, "wb") as f:
+            f.write(data)
+
+        self._reset()
+        self.generation = generation
+        for record in records:
+            self._apply(record)
+        self.log_size = len(data)
+        self._map()
+        self._write_meta()
+        current = {os.path.basename(path) for path in self._paths(generation)} | {"meta.json"}
+        for name in os.listdir(self.directory):
+            if name not in current and not name.endswith(".tmp"):
+                # Readers that still map an old file keep it open until they reload
+                os.remove(os.path.join(self.directory, name))
+
+    def _migrate(self, meta):
+        """Convert a store written as one vectors.npy plus payloads in meta.json"""
+        matrix = np.load(os.path.join(self.directory, "vectors.npy"), mmap_mode="r")
+        records = [
+            {"row": row, "id": point_id, "payload": payload}
+            for row, (point_id, payload) in enumerate(zip(meta["ids"], meta["payloads"]))
+        ]
+        self.indexed_fields = meta.get("indexes", [])
+        self._write_generation(1, matrix, np.arange(len(records)), records)
+
+    def _compact(self):
+        """Rewrite the store without deleted rows"""
+        live = np.array([row for row, point_id in enumerate(self.ids) if point_id is not None], dtype=np.int64)
+        records = [{"row": i, "id": self.ids[row], "payload": self.payloads[row]} for i, row in enumerate(live)]
+        self._write_generation(self.generation + 1, self.matrix, live, records)
+
+    def _begin_write(self):
+        """Create the store if needed, and drop anything a crashed writer appended after the last flush"""
+        if self.generation is None:
+            self._write_generation(1, self.matrix, np.arange(0), [])
+        if self.dirty:
+            return
+        vectors_path, points_path = self._paths(self.generation)
+        for path, size in ((vectors_path, len(self.ids) * self.size * 4), (points_path, self.log_size)):
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _append_log(self, records):
+        data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+        with open(self._paths(self.generation)[1], "ab") as f:
+            f.write(data)
+        self.log_size += len(data)
+
+    def _next_generation(self):
+        # Read leniently: recreating is how a store of another vector size gets replaced
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f).get("generation", 0) + 1
+        except OSError:
+            return 1
+
+    def recreate(self):
+        with self.lock:
+            self.indexed_fields = []
+            self._write_generation(self._next_generation(), self.matrix[:0], np.arange(0), [])
+
+    def ensure(self):
+        """Create the store if it is missing, returns True when it was created"""
+        with self.lock:
+            if self._version() is not None:
+                return False
+            self.indexed_fields = []
+            self._write_generation(self._next_generation(), self.matrix[:0], np.arange(0), [])
+            return True
+
+    def create_payload_index(self, field: str):
+        """Index a payload field for filtered searches; the rows per value are built on first use"""
+        with self.lock:
+            self._load()
+            if field in self.indexed_fields:
+                return
+            self._begin_write()
+            self.indexed_fields = self.indexed_fields + [field]
+            self.dirty = True
+            self._flush()
+
+    def upsert(self, points):
+        with self.lock:
+            self._load()
+            self._begin_write()
+            vectors = self._normalize([point.vector for point in points])
+            stored_rows = len(self.ids)
+            updates = {}
+            appended = []
+            records = []
+            for point, vector in zip(points, vectors):
+                point_id = str(point.id)
+                row = self.positions.get(point_id)
+                if row is None:
+                    row = len(self.ids)
+                    appended.append(vector)
+                elif row >= stored_rows:
+                    appended[row - stored_rows] = vector
+                else:
+                    updates[row] = vector
+                record = {"row": row, "id": point_id, "payload": point.payload}
+                self._apply(record)
+                records.append(record)
+
+            vectors_path = self._paths(self.generation)[0]
+            if updates:
+                # Existing rows are overwritten in place
+                matrix = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(stored_rows, self.size))
+                matrix[list(updates)] = np.stack(list(updates.values()))
+                matrix.flush()
+                del matrix
+            if appended:
+                with open(vectors_path, "ab") as f:
+                    f.write(np.ascontiguousarray(appended, dtype=np.float32).tobytes())
+            self._append_log(records)
+            self._map()
+            self._invalidate()
+            self.dirty = True
+
+    def delete(self, point_ids):
+        with self.lock:
+            self._load()
+            rows = {self.positions[str(point_id)] for point_id in point_ids if str(point_id) in self.positions}
+            if not rows:
+                return
+            self._begin_write()
+            records = [{"row": row, "deleted": True} for row in sorted(rows)]
+            for record in records:
+                self._apply(record)
+            self._append_log(records)
+            self._invalidate()
+            self.dirty = True
+
+    def flush(self):
+        """Commit pending changes, so other processes see them"""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.dirty:
+            return
+        if len(self.deleted) > COMPACT_RATIO * len(self.ids):
+            self._compact()
+        else:
+            self._write_meta()
+
+    def check_config(self):
+        """Loading raises when the stored vector size does not match the settings"""
+        with self.lock:
+            self._load()
+
+    def count(self):
+        with self.lock:
+            self._load()
+            return len(self.positions)
+
+    def scroll(self, batch_size=256):
+        from qdrant_client.http.models import PointStruct
+        with self.lock:
+            self._load()
+            ids, payloads, matrix = list(self.ids), list(self.payloads), self.matrix
+        for i, point_id in enumerate(ids):
+            if point_id is not None:
+                yield PointStruct(id=point_id, vector=np.asarray(matrix[i]).tolist(), payload=payloads[i])
+
+    def retrieve(self, point_ids):
+        """Vectors (normalised) of the points that exist, keyed by ID"""
+        with self.lock:
+            self._load()
+            return {
+                str(point_id): np.asarray(self.matrix[self.positions[str(point_id)]]).tolist()
+                for point_id in point_ids if str(point_id) in self.positions
+            }
+
+    def _alive(self):
+        """Mask of rows that are not deleted"""
+        if self.alive is None:
+            alive = np.ones(len(self.ids), dtype=bool)
+            alive[list(self.deleted)] = False
+            self.alive = alive
+        return self.alive
+
+    def _hnsw_index(self):
+        if self.hnsw is None:
+            try:
+                import hnswlib
+            except ImportError:
+                return None
+            rows = np.flatnonzero(self._alive())
+            index = hnswlib.Index(space="ip", dim=self.size)
+            index.init_index(max_elements=max(1, len(rows)), ef_construction=200, M=16)
+            index.add_items(np.asarray(self.matrix[rows]), rows)
+            index.set_ef(64)
+            self.hnsw = index
+        return self.hnsw
+
+    def _field_rows(self, field: str):
+        """Row numbers per value of an indexed field; rows without the field are under None"""
+        if field not in self.field_rows:
+            rows = {}
+            for i, payload in enumerate(self.payloads):
+                if payload is not None:
+                    rows.setdefault(payload.get(field), []).append(i)
+            self.field_rows[field] = {value: np.array(found) for value, found in rows.items()}
+        return self.field_rows[field]
+
+    def _filter_rows(self, filters: dict):
+        """Rows whose payload matches every filter, in order"""
+        matched = self._alive().copy()
+        for field, wanted in filters.items():
+            if field in self.indexed_fields:
+                rows = self._field_rows(field)
+                selected = np.zeros(len(self.ids), dtype=bool)
+                for value in filter_values(wanted) + [None]:
+                    if value in rows:
+                        selected[rows[value]] = True
+            else:
+                selected = np.array([
+                    payload is not None and payload_matches(payload, {field: wanted}) for payload in self.payloads
+                ], dtype=bool)
+            matched &= selected
+        return np.flatnonzero(matched)
+
+    def _quantized_codes(self):
+        if self.codes is None:
+            count = len(self.ids)
+            if self.quantization == "int8":
+                # One scale for the whole matrix, clipping the 1% largest components like Qdrant's quantile
+                sample = np.asarray(self.matrix[::max(1, count // 10000)])
+                self.scale = float(np.quantile(np.abs(sample), 0.99)) / 127 or 1.0
+                codes = np.empty((count, self.size), dtype=np.int8)
+                for start in range(0, count, QUANTIZED_BLOCK):
+                    block = np.asarray(self.matrix[start:start + QUANTIZED_BLOCK])
+                    codes[start:start + QUANTIZED_BLOCK] = np.clip(np.rint(block / self.scale), -127, 127)
+            else:
+                # One sign bit per dimension, rows zero-padded to whole 64-bit words
+                codes = np.zeros((count, -(-self.size // 64) * 8), dtype=np.uint8)
+                for start in range(0, count, QUANTIZED_BLOCK):
+                    block = np.packbits(np.asarray(self.matrix[start:start + QUANTIZED_BLOCK]) > 0, axis=1)
+                    codes[start:start + QUANTIZED_BLOCK, :block.shape[1]] = block
+            self.codes = codes
+        return self.codes
+
+    def _quantized_scores(self, query):
+        """Approximate similarity of every point to the query, computed from the codes"""
+        codes = self._quantized_codes()
+        scores = np.empty(len(codes), dtype=np.float32)
+        if self.quantization == "int8":
+            query_codes = np.clip(np.rint(query / self.scale), -127, 127).astype(np.float32)
+            for start in range(0, len(codes), QUANTIZED_BLOCK):
+                # Decode a block at a time so the product still runs in BLAS
+                scores[start:start + QUANTIZED_BLOCK] = codes[start:start + QUANTIZED_BLOCK].astype(np.float32) @ query_codes
+        else:
+            query_bits = np.zeros(codes.shape[1], dtype=np.uint8)
+            packed = np.packbits(query > 0)
+            query_bits[:len(packed)] = packed
+            for start in range(0, len(codes), QUANTIZED_BLOCK):
+                # Fewer differing bits is closer
+                scores[start:start + QUANTIZED_BLOCK] = -hamming_distances(codes[start:start + QUANTIZED_BLOCK], query_bits)
+        return scores
+
+    def search(self, vector, limit: int, filters=None):
+        with self.lock:
+            self._load()
+            if not self.positions:
+                return []
+            query = self._normalize(vector)
+            limit = min(limit, len(self.positions))
+            dead = np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted))
+
+            index = None
+            if not filters and self.quantization == "none" and len(self.positions) >= VECTOR_STORE_HNSW_THRESHOLD:
+                index = self._hnsw_index()
+            if filters:
+                # An exact scan of the matching rows only, which is a small subset for a narrow filter
+                rows = self._filter_rows(filters)
+                if not len(rows):
+                    return []
+                limit = min(limit, len(rows))
+                similarities = np.asarray(self.matrix[rows]) @ query
+                order = np.argpartition(-similarities, limit - 1)[:limit]
+                order = order[np.argsort(-similarities[order])]
+                top = rows[order]
+                scores = similarities[order]
+            elif self.quantization != "none":
+                candidates = min(len(self.positions), max(limit, int(limit * self.oversampling)))
+                approximate = self._quantized_scores(query)
+                approximate[dead] = -np.inf
+                rows = np.sort(np.argpartition(-approximate, candidates - 1)[:candidates])
+                # Rescore at full precision; sorted rows keep memory-mapped reads sequential
+                similarities = np.asarray(self.matrix[rows]) @ query
+                order = np.argsort(-similarities)[:limit]
+                top = rows[order]
+                scores = similarities[order]
+            elif index is not None:
+                labels, distances = index.knn_query(query, k=limit)
+                top = labels[0]
+                scores = 1.0 - distances[0]
+            else:
+                similarities = self.matrix @ query
+                similarities[dead] = -np.inf
+                top = np.argpartition(-similarities, limit - 1)[:limit]
+                top = top[np.argsort(-similarities[top])]
+                scores = similarities[top]
+
+            return [
+                {"id": self.ids[i], "score": float(score), "payload": self.payloads[i]}
+                for i, score in zip(top, scores)
+            ]
+
+    async def asearch(self, vector, limit: int, filters=None):
+        # The scan, a first HNSW build or a reload would otherwise block the calling loop
+        return await asyncio.to_thread(self.search, vector, limit, filters)
+
+
+def create_vector_store(kind=VECTOR_STORE, collection=COLLECTION_NAME):
+    """Build the vector store selected by the VECTOR_STORE setting"""
+    if kind == "qdrant":
+        return QdrantVectorStore(collection)
+    if kind == "local":
+        return LocalVectorStore(collection)
+    raise ValueError(f"Unknown VECTOR_STORE {kind!r}, expected 'qdrant' or 'local'")
+
+
+def copy_points(source, target, batch_size=256):
+    """Copy every point from one store to another, replacing the target's contents"""
+    target.recreate()
+    batch = []
+    copied = 0
+    for point in source.scroll(batch_size):
+        batch.append(point)
+        if len(batch) == batch_size:
+            target.upsert(batch)
+            copied += len(batch)
+            batch = []
+    if batch:
+        target.upsert(batch)
+        copied += len(batch)
+    target.flush()
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the knowledge base between Qdrant and the local vector store")
+    parser.add_argument("direction", choices=["export", "import"],
+                        help="export: Qdrant -> local store, import: local store -> Qdrant")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    qdrant_store = QdrantVectorStore(args.collection)
+    local_store = LocalVectorStore(args.collection)
+    if args.direction == "export":
+        copied = copy_points(qdrant_store, local_store)
+    else:
+        copied = copy_points(local_store, qdrant_store)
+    print(f"{copied} points copied")
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from settings import *
+from metrics import LatencyStats, SIZE_BUCKETS
+from tracing import tracer
+
+
+class WriteBatcher:
+    """Group commit for inserts: concurrent callers share one unordered insert_many.
+
+    A batch is written when it reaches max_batch documents or window seconds after
+    its first document arrived, whichever comes first. Each caller is acknowledged
+    only once its batch has committed, and gets its own document's write error.
+    """
+
+    def __init__(self, collection, max_batch=COMPLAINT_BATCH_SIZE, window=COMPLAINT_BATCH_WINDOW):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.window = window
+        self.pending = []
+        self.timer = None
+        self.flushes = set()
+        # Documents per insert_many
+        self.batch_sizes = LatencyStats(SIZE_BUCKETS)
+        # "commit": one insert_many, "acknowledged": a caller's wait from insert to acknowledgement
+        self.latency = LatencyStats()
+
+    async def insert(self, doc: dict):
+        """Queue one document and wait until its batch is committed"""
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((doc, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush_now()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.window, self.flush_now)
+        try:
+            return await future
+        finally:
+            self.latency.observe("acknowledged", time.perf_counter() - start)
+
+    def flush_now(self):
+        """Start writing the pending batch"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self.commit(batch))
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
+
+    async def commit(self, batch):
+        docs = [doc for doc, _ in batch]
+        errors = {}
+        start = time.perf_counter()
+        try:
+            with tracer.span("mongo.complaints.insert_many", documents=len(docs)):
+                await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Unordered inserts carry on past failures, so only these documents are missing
+            for error in e.details.get("writeErrors", []):
+                error_class = DuplicateKeyError if error.get("code") == 11000 else WriteError
+                errors[error["index"]] = error_class(error.get("errmsg", "write error"), error.get("code"), error)
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        finally:
+            self.latency.observe("commit", time.perf_counter() - start)
+            self.batch_sizes.observe("documents", len(batch))
+
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(None)
+
+    async def close(self):
+        """Write whatever is still queued and wait for batches in flight"""
+        self.flush_now()
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)